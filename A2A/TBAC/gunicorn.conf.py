@@ -0,0 +1,45 @@
+"""
+Gunicorn configuration for the A2A Medical Triage Service
+
+Run from this directory:
+    gunicorn -c gunicorn.conf.py 'tbac_a2aservice:create_app()'
+
+The gevent worker monkey-patches the standard library before the app is
+loaded, so each blocking call to the external triage API yields to other
+requests instead of holding a worker for the full round trip. One worker
+can therefore keep up to worker_connections triage sessions waiting on the
+triage API at once; size TRIAGE_HTTP_POOL_MAXSIZE to the number you expect
+to be in flight so their connections stay alive between turns.
+
+Without gevent installed, set GUNICORN_WORKER_CLASS=gthread: each worker
+then serves GUNICORN_THREADS requests concurrently on OS threads, which
+also release the GIL while waiting on the triage API.
+
+Tasks are kept in process memory, so a single worker is used by default;
+raise GUNICORN_WORKERS only if every client is pinned to one worker.
+
+With several workers on a multi-socket host, GUNICORN_PIN_WORKERS=true pins
+each worker to one CPU (Linux only) so its task store stays in local cache.
+"""
+
+import os
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:8887')
+worker_class = os.getenv('GUNICORN_WORKER_CLASS', 'gevent')
+workers = int(os.getenv('GUNICORN_WORKERS', '1'))
+worker_connections = int(os.getenv('GUNICORN_WORKER_CONNECTIONS', '1000'))  # gevent
+threads = int(os.getenv('GUNICORN_THREADS', '32'))  # gthread
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '120'))
+keepalive = 5
+pin_workers = os.getenv('GUNICORN_PIN_WORKERS', 'false').lower() == 'true'
+
+
+def post_fork(server, worker):
+    """Pin the new worker to one of the CPUs this process may run on"""
+    if not pin_workers or not hasattr(os, 'sched_setaffinity'):
+        return
+    cpus = sorted(os.sched_getaffinity(0))
+    # worker.age increases with every spawn, so workers spread across the CPUs
+    cpu = cpus[worker.age % len(cpus)]
+    os.sched_setaffinity(0, {cpu})
+    server.log.info("Worker %s pinned to CPU %s", worker.pid, cpu)
@@ -2,32 +2,170 @@
 A2A Medical Triage Service with TBAC Integration
 """
 
-import json
+# When run directly, patch the standard library for gevent before anything
+# imports sockets, so blocking triage API calls yield to other requests.
+# Under gunicorn the gevent worker does this itself.
+if __name__ == "__main__":
+    try:
+        from gevent import monkey
+        monkey.patch_all()
+    except ImportError:
+        pass
+
 import os
 import re
+import atexit
+import queue
 import base64
-import uuid
+import hashlib
 import time
 import logging
-from datetime import datetime
+import logging.handlers
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
 from typing import Dict, Optional, List, Any
 from enum import Enum
+from itertools import islice
+from types import MappingProxyType
 
+import orjson
 import requests
-from flask import Flask, request, jsonify
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from flask import Flask, Response, request
 from flask_cors import CORS
 
 # TBAC imports
 from dotenv import load_dotenv
 from identityservice.sdk import IdentityServiceSdk
 
+def _setup_logging():
+    """Configure root logging like basicConfig, but write to stderr from a listener thread
+    
+    Request threads only put records on a queue, so a slow or contended stderr
+    never stalls a request. Does nothing if the root logger is already configured.
+    """
+    root = logging.getLogger()
+    if root.handlers:
+        return
+    
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+    log_queue = queue.SimpleQueue()
+    listener = logging.handlers.QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    
+    root.setLevel(logging.INFO)
+    root.addHandler(logging.handlers.QueueHandler(log_queue))
+    listener.start()
+    # Flush queued records on shutdown
+    atexit.register(listener.stop)
+
 # Setup logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
+_setup_logging()
 logger = logging.getLogger(__name__)
 
+# Refresh cached tokens this many seconds before they actually expire
+TOKEN_EXPIRY_SKEW = 30
+
+# Task storage bounds: idle tasks expire after TASK_TTL_SECONDS, the least recently
+# used are evicted beyond MAX_TASKS, and only the last MAX_TASK_HISTORY messages are kept
+MAX_TASKS = int(os.getenv('A2A_MAX_TASKS', '10000'))
+TASK_TTL_SECONDS = int(os.getenv('A2A_TASK_TTL_SECONDS', '3600'))
+MAX_TASK_HISTORY = 64
+
+# Results of recent message/send calls, replayed when a peer retries the same messageId
+DEDUP_CACHE_SIZE = 2048
+DEDUP_TTL_SECONDS = 60
+
+# Headers shared by every triage API request
+_JSON_HEADERS = MappingProxyType({
+    "Content-Type": "application/json",
+    "Accept": "application/json",
+    "User-Agent": "a2a-triage/1.0"
+})
+
+# Keep-alive connections retained per triage API host. Under the gevent worker many
+# sessions wait on the triage API at once; connections beyond this are closed after use.
+TRIAGE_HTTP_POOL_MAXSIZE = int(os.getenv('TRIAGE_HTTP_POOL_MAXSIZE', '128'))
+
+# Demographic extraction patterns, compiled once at import
+_AGE_PATTERNS = tuple(re.compile(p) for p in (
+    r'\b(\d{1,2})\s*(?:years?\s*old|yo)\b',
+    r'\bage\s*(?:is\s*)?(\d{1,2})\b',
+    r'\bi\s*am\s*(\d{1,2})\b'
+))
+_MALE_WORDS = ('male', 'man', 'boy', 'he', 'his', 'him')
+_FEMALE_WORDS = ('female', 'woman', 'girl', 'she', 'her')
+# One alternation over both word lists: group 1 is a male hit, group 2 a female one
+_SEX_PATTERN = re.compile(
+    r'\b(?:(%s)|(%s))\b' % ('|'.join(_MALE_WORDS), '|'.join(_FEMALE_WORDS))
+)
+
+# (unix second, formatted timestamp); replaced as a whole so concurrent readers never see a torn pair
+_iso_now_cache = (0, "")
+
+def _iso_now():
+    """Current UTC time as an ISO 8601 string, formatted at most once per second"""
+    global _iso_now_cache
+    now = int(time.time())
+    cached_second, formatted = _iso_now_cache
+    if now != cached_second:
+        formatted = time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(now))
+        _iso_now_cache = (now, formatted)
+    return formatted
+
+def _uuid4_batch(n):
+    """Generate n random (version 4) UUID strings from a single urandom read"""
+    raw = bytearray(os.urandom(16 * n))
+    ids = []
+    for i in range(0, 16 * n, 16):
+        raw[i + 6] = (raw[i + 6] & 0x0f) | 0x40  # version 4
+        raw[i + 8] = (raw[i + 8] & 0x3f) | 0x80  # RFC 4122 variant
+        h = raw[i:i + 16].hex()
+        ids.append(f"{h[:8]}-{h[8:12]}-{h[12:16]}-{h[16:20]}-{h[20:]}")
+    return ids
+
+def _uuid7():
+    """Generate a time-ordered (version 7) UUID string: 48-bit Unix milliseconds, then random bits"""
+    raw = bytearray((time.time_ns() // 1_000_000).to_bytes(6, 'big') + os.urandom(10))
+    raw[6] = (raw[6] & 0x0f) | 0x70  # version 7
+    raw[8] = (raw[8] & 0x3f) | 0x80  # RFC 4122 variant
+    h = raw.hex()
+    return f"{h[:8]}-{h[8:12]}-{h[12:16]}-{h[16:20]}-{h[20:]}"
+
+def _json_response(obj, status=200):
+    """Serialize a response body with orjson, which emits UTF-8 bytes directly"""
+    return Response(orjson.dumps(obj), status=status, mimetype='application/json')
+
+def _etag_for(body):
+    """Strong ETag for a serialized response body"""
+    return hashlib.blake2b(body, digest_size=16).hexdigest()
+
+def _conditional_json_response(body, etag):
+    """Serve a pre-serialized JSON body, answering 304 when the client already has it"""
+    response = Response(body, mimetype='application/json')
+    response.set_etag(etag)
+    return response.make_conditional(request)
+
+def _body_snippet(response, limit=200):
+    """First few hundred bytes of a response body for error messages
+    
+    Avoids response.text, which decodes the whole body and may run charset
+    detection when the server doesn't declare an encoding.
+    """
+    return response.content[:limit].decode('utf-8', errors='replace')
+
+def _jwt_expiry(token):
+    """Return the `exp` claim of a JWT as a unix timestamp, or None if it can't be read"""
+    try:
+        payload = token.split('.')[1]
+        payload += '=' * (-len(payload) % 4)
+        return float(orjson.loads(base64.urlsafe_b64decode(payload))['exp'])
+    except Exception:
+        return None
+
 class TaskState(str, Enum):
     """A2A Task States as defined in the Agent-to-Agent protocol"""
     SUBMITTED = "submitted"
@@ -40,6 +178,54 @@ class TaskState(str, Enum):
     AUTH_REQUIRED = "auth-required"
     UNKNOWN = "unknown"
 
+# States from which a task can no longer be continued
+_TERMINAL_STATES = frozenset({TaskState.COMPLETED, TaskState.FAILED, TaskState.CANCELED})
+
+@dataclass(slots=True)
+class TaskStatus:
+    """A2A task status; field names match the protocol, so orjson serializes it directly"""
+    state: TaskState = TaskState.SUBMITTED
+    timestamp: str = field(default_factory=_iso_now)
+    message: Optional[Dict[str, Any]] = None
+
+@dataclass(slots=True)
+class TriageTask:
+    """In-memory state of a triage task, converted to the A2A task shape only when responding"""
+    id: str
+    context_id: str
+    status: TaskStatus = field(default_factory=TaskStatus)
+    history: deque = field(default_factory=lambda: deque(maxlen=MAX_TASK_HISTORY))
+    artifacts: List[Dict[str, Any]] = field(default_factory=list)
+    triage_token: Optional[str] = None
+    survey_id: Optional[str] = None
+    triage_state: str = "starting"
+    pending_messages: List[str] = field(default_factory=list)
+    
+    def set_state(self, state):
+        """Move the task to a new state and stamp the status timestamp"""
+        self.status.state = state
+        self.status.timestamp = _iso_now()
+    
+    def to_a2a_dict(self, history_length=None):
+        """Build the A2A protocol task object, optionally limited to the last history_length messages"""
+        # Copy only the visible window out of the history ring buffer
+        skip = max(0, len(self.history) - history_length) if history_length else 0
+        history = list(islice(self.history, skip, None))
+        
+        return {
+            "id": self.id,
+            "contextId": self.context_id,
+            "status": self.status,
+            "history": history,
+            "artifacts": self.artifacts,
+            "metadata": {
+                "triage_token": self.triage_token,
+                "survey_id": self.survey_id,
+                "triage_state": self.triage_state
+            },
+            "kind": "task"
+        }
+
 class TBACConfig:
     """TBAC configuration and authorization handler"""
     
@@ -52,12 +238,17 @@ class TBACConfig:
         self.a2a_api_key = os.getenv('A2A_SERVICE_API_KEY')
         self.a2a_id = os.getenv('A2A_SERVICE_ID')
         
+        # Credentials are fixed for the life of the process
+        self._creds_configured = bool(self.client_api_key and self.a2a_api_key)
+        
         self.client_sdk = None
         self.a2a_sdk = None
         self.client_authorized = False
         self.a2a_authorized = False
         self.client_token = None
         self.a2a_token = None
+        self._client_token_exp = None
+        self._a2a_token_exp = None
         
         self._setup()
     
@@ -72,7 +263,12 @@ class TBACConfig:
             self.a2a_sdk = IdentityServiceSdk(api_key=self.a2a_api_key)
             logger.info("TBAC SDKs initialized")
         except Exception as e:
-            logger.error(f"TBAC setup failed: {e}")
+            logger.error("TBAC setup failed: %s", e)
+    
+    @staticmethod
+    def _token_fresh(token, exp):
+        """Check whether a cached TBAC token can still be used"""
+        return bool(token) and exp is not None and time.time() < exp - TOKEN_EXPIRY_SKEW
     
     def authorize_client_to_a2a(self):
         """Authorize client agent to communicate with A2A service"""
@@ -81,14 +277,18 @@ class TBACConfig:
             return True
         
         try:
-            logger.info("TBAC: Getting client agent access token...")
-            self.client_token = self.client_sdk.access_token(agentic_service_id=self.a2a_id)
-            
-            if not self.client_token:
-                logger.error("TBAC FAILED: Could not get client agent token")
-                return False
-            
-            logger.info(f"TBAC SUCCESS: client token obtained")
+            if self._token_fresh(self.client_token, self._client_token_exp):
+                logger.info("TBAC: Reusing cached client agent access token")
+            else:
+                logger.info("TBAC: Getting client agent access token...")
+                self.client_token = self.client_sdk.access_token(agentic_service_id=self.a2a_id)
+                
+                if not self.client_token:
+                    logger.error("TBAC FAILED: Could not get client agent token")
+                    return False
+                
+                self._client_token_exp = _jwt_expiry(self.client_token)
+                logger.info("TBAC SUCCESS: client token obtained")
             
             logger.info("TBAC: Authorizing client token with A2A service...")
             self.client_authorized = self.a2a_sdk.authorize(self.client_token)
@@ -101,7 +301,7 @@ class TBACConfig:
                 return False
                 
         except Exception as e:
-            logger.error(f"TBAC client-to-a2a authorization failed: {e}")
+            logger.error("TBAC client-to-a2a authorization failed: %s", e)
             return False
     
     def authorize_a2a_to_client(self):
@@ -111,14 +311,18 @@ class TBACConfig:
             return True
         
         try:
-            logger.info("TBAC: A2A service getting access token...")
-            self.a2a_token = self.a2a_sdk.access_token(agentic_service_id=self.client_id)
-            
-            if not self.a2a_token:
-                logger.error("TBAC FAILED: Could not get A2A service token")
-                return False
-            
-            logger.info(f"TBAC SUCCESS: A2A token obtained")
+            if self._token_fresh(self.a2a_token, self._a2a_token_exp):
+                logger.info("TBAC: Reusing cached A2A service access token")
+            else:
+                logger.info("TBAC: A2A service getting access token...")
+                self.a2a_token = self.a2a_sdk.access_token(agentic_service_id=self.client_id)
+                
+                if not self.a2a_token:
+                    logger.error("TBAC FAILED: Could not get A2A service token")
+                    return False
+                
+                self._a2a_token_exp = _jwt_expiry(self.a2a_token)
+                logger.info("TBAC SUCCESS: A2A token obtained")
             
             logger.info("TBAC: Authorizing A2A token with client agent...")
             self.a2a_authorized = self.client_sdk.authorize(self.a2a_token)
@@ -131,33 +335,107 @@ class TBACConfig:
                 return False
                 
         except Exception as e:
-            logger.error(f"TBAC A2A-to-client authorization failed: {e}")
+            logger.error("TBAC A2A-to-client authorization failed: %s", e)
             return False
     
     def authorize_bidirectional(self):
-        """Perform bidirectional authorization"""
-        client_to_a2a = self.authorize_client_to_a2a()
-        a2a_to_client = self.authorize_a2a_to_client()
-        return client_to_a2a and a2a_to_client
+        """Perform bidirectional authorization, running both directions concurrently"""
+        with ThreadPoolExecutor(max_workers=2, thread_name_prefix='tbac') as pool:
+            client_to_a2a = pool.submit(self.authorize_client_to_a2a)
+            a2a_to_client = pool.submit(self.authorize_a2a_to_client)
+            return client_to_a2a.result() and a2a_to_client.result()
     
     def is_client_authorized(self):
         """Check if client agent is authorized to communicate with A2A service"""
-        return self.client_authorized or not all([self.client_api_key, self.a2a_api_key])
+        return self.client_authorized or not self._creds_configured
     
     def is_a2a_authorized(self):
         """Check if A2A service is authorized to communicate with client agent"""
-        return self.a2a_authorized or not all([self.client_api_key, self.a2a_api_key])
+        return self.a2a_authorized or not self._creds_configured
     
     def is_fully_authorized(self):
         """Check if both directions are authorized"""
         return self.is_client_authorized() and self.is_a2a_authorized()
 
+class TaskStore:
+    """Bounded in-memory store with LRU eviction and an idle TTL
+    
+    Entries are kept in access order, so expired entries are at the front and can
+    be dropped without scanning the whole store. Entries for which `pinned(value)`
+    is true are skipped by capacity eviction; they are moved to the back with
+    their last access unchanged, so they still expire by TTL once they reach the
+    front again or eviction next meets them. Not thread-safe on its own; callers
+    hold the service lock.
+    """
+    
+    def __init__(self, maxsize=MAX_TASKS, ttl=TASK_TTL_SECONDS, pinned=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.pinned = pinned
+        self._items = OrderedDict()  # key -> (value, last_access)
+    
+    def _expire(self, now):
+        """Drop entries that have been idle longer than the TTL"""
+        items = self._items
+        while items:
+            key, (value, last_access) = next(iter(items.items()))
+            if now - last_access < self.ttl:
+                break
+            del items[key]
+    
+    def get(self, key):
+        """Return the value for key and mark it as recently used, or None"""
+        now = time.monotonic()
+        self._expire(now)
+        entry = self._items.get(key)
+        if entry is None:
+            return None
+        self._items[key] = (entry[0], now)
+        self._items.move_to_end(key)
+        return entry[0]
+    
+    def set(self, key, value):
+        """Insert or replace a value, evicting the least recently used entries if full"""
+        now = time.monotonic()
+        self._expire(now)
+        self._items[key] = (value, now)
+        self._items.move_to_end(key)
+        while len(self._items) > self.maxsize:
+            if not self._evict_one():
+                logger.warning("Task store over capacity (%s/%s): all entries pinned", len(self._items), self.maxsize)
+                break
+    
+    def _evict_one(self):
+        """Evict the least recently used unpinned entry; return False if there is none
+        
+        Pinned entries met at the front are moved to the back, so later evictions
+        do not walk past them again; one already idle past the TTL is dropped.
+        """
+        items = self._items
+        if self.pinned is not None:
+            now = time.monotonic()
+            for _ in range(len(items)):
+                key, (value, last_access) = next(iter(items.items()))
+                if not self.pinned(value) or now - last_access >= self.ttl:
+                    break
+                items.move_to_end(key)
+            else:
+                return False
+        evicted, _ = items.popitem(last=False)
+        logger.info("Evicted task %s from task store (capacity %s)", evicted, self.maxsize)
+        return True
+    
+    def __len__(self):
+        self._expire(time.monotonic())
+        return len(self._items)
+
 class A2ATriageService:
     """
     Standalone A2A Medical Triage Service with TBAC Integration
     """
     
-    def __init__(self, host='0.0.0.0', port=8887, debug=False, enable_tbac=True):
+    def __init__(self, host='0.0.0.0', port=8887, debug=False, enable_tbac=True,
+                 connect_timeout=3.0, read_timeout=27.0):
         self.app = Flask(__name__)
         CORS(self.app)
         
@@ -168,17 +446,60 @@ class A2ATriageService:
         # Initialize TBAC
         self.tbac = TBACConfig() if enable_tbac else None
         self.enable_tbac = enable_tbac
+        self._tbac_active = bool(enable_tbac and self.tbac is not None)
         
-        # In-memory storage for tasks and contexts
-        self.tasks = {}
-        self.contexts = {}
+        # In-memory storage for tasks and contexts. Requests are served
+        # concurrently (threads or gevent greenlets), so guard access.
+        # Only tasks with a triage call in flight are pinned; idle ones waiting on
+        # input count toward the bound like any other entry
+        self.tasks = TaskStore(pinned=lambda task: task.status.state == TaskState.WORKING)
+        self.contexts = TaskStore()
+        self._recent_results = TaskStore(maxsize=DEDUP_CACHE_SIZE, ttl=DEDUP_TTL_SECONDS)
+        self._lock = threading.RLock()
+        
+        # Client-credentials token for the external triage API, shared by all tasks
+        self._triage_token_cache = {"token": None, "expires_at": 0}
+        self._triage_token_lock = threading.Lock()
         
         # Load triage API configuration
         self._load_triage_config()
         
+        # Pooled keep-alive session for all external triage API calls. A separate
+        # connect timeout aborts an unreachable backend quickly instead of
+        # spending the whole read budget on the handshake.
+        self.http = self._create_http_session()
+        self.http_timeout = (connect_timeout, read_timeout)
+        
+        # Agent card is static apart from the request host and TBAC status
+        self._card_template = self._build_agent_card_template()
+        self._card_cache = {}
+        
+        # JSON-RPC method -> handler
+        self._rpc_dispatch = {
+            'message/send': self._handle_message_send,
+            'tasks/get': self._handle_tasks_get,
+            'tasks/cancel': self._handle_tasks_cancel
+        }
+        
         # Setup Flask routes
         self._setup_routes()
         
+        # External triage state -> task transition; anything else waits for more input
+        self._external_state_handlers = {
+            'present_result': self._finalize_completed_task,
+            'post_result': self._handle_post_result,
+            'in_progress': self._await_more_input
+        }
+        
+        # Worker pool for independent external calls
+        self._executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix='triage')
+        
+        # Background workers for non-blocking message/send requests
+        self._triage_workers = ThreadPoolExecutor(max_workers=64, thread_name_prefix='triage-call')
+        
+        # Warm the triage token cache while TBAC authorization runs
+        self._executor.submit(self._prefetch_triage_token)
+        
         # Perform TBAC authorization if enabled
         if self.tbac:
             logger.info("Performing TBAC authorization...")
@@ -187,11 +508,11 @@ class A2ATriageService:
             else:
                 logger.info("TBAC authorization successful")
         
-        logger.info(f"A2A Triage Service initialized - will run on {host}:{port}")
+        logger.info("A2A Triage Service initialized - will run on %s:%s", host, port)
     
     def _check_authorization(self, operation="general"):
         """Check TBAC authorization for operations"""
-        if not self.enable_tbac or not self.tbac:
+        if not self._tbac_active:
             return True
         
         if operation == "receive_message":
@@ -236,81 +557,79 @@ class A2ATriageService:
         if missing_vars:
             raise ValueError(f"Missing required environment variables: {missing_vars}")
         
+        # OAuth client credentials never change, so encode the token request headers once
+        creds = base64.b64encode(f"{self.triage_app_id}:{self.triage_app_key}".encode()).decode()
+        self._triage_token_headers = MappingProxyType({
+            **_JSON_HEADERS,
+            "Authorization": f"Basic {creds}",
+            "instance-id": self.triage_instance_id
+        })
+        self._bearer_header_cache = {}
+        
         logger.info("Triage API configuration loaded successfully")
     
+    def _create_http_session(self):
+        """Create a requests session that keeps TLS connections to the triage API alive
+        
+        This stays on HTTP/1.1 keep-alive rather than HTTP/2: requests has no HTTP/2
+        support, and each triage session sends one message at a time, so a few
+        warm pooled connections already avoid repeated TLS handshakes.
+        """
+        session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=32,
+            pool_maxsize=TRIAGE_HTTP_POOL_MAXSIZE,
+            max_retries=Retry(total=2, backoff_factor=0.1, status_forcelist=[502, 503, 504])
+        )
+        # Same pool settings for plain-http backends (e.g. a local triage API)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        return session
+    
+    def _bearer_headers(self, token):
+        """Read-only request headers for a triage API token, built once per token"""
+        headers = self._bearer_header_cache.get(token)
+        if headers is None:
+            headers = MappingProxyType({**_JSON_HEADERS, "Authorization": f"Bearer {token}"})
+            # Tasks normally share the cached token, so this rarely holds more than a few
+            if len(self._bearer_header_cache) >= 64:
+                self._bearer_header_cache.clear()
+            self._bearer_header_cache[token] = headers
+        return headers
+    
+    def _timed_external_request(self, method, url, label, **kwargs):
+        """Issue an external API request over the pooled session and log its latency
+        
+        Returns the response and the elapsed time in integer microseconds.
+        """
+        kwargs.setdefault('timeout', self.http_timeout)
+        start = time.perf_counter_ns()
+        try:
+            response = self.http.request(method, url, **kwargs)
+        except requests.RequestException as e:
+            elapsed_us = (time.perf_counter_ns() - start) // 1000
+            logger.error("%s failed after %dus: %s", label, elapsed_us, e)
+            raise
+        elapsed_us = (time.perf_counter_ns() - start) // 1000
+        logger.info("%s: HTTP %s in %dus", label, response.status_code, elapsed_us)
+        return response, elapsed_us
+    
     def _setup_routes(self):
         """Setup Flask routes for A2A protocol endpoints"""
         
         @self.app.route('/.well-known/agent-card.json', methods=['GET'])
         def agent_card():
             """A2A Agent Discovery Card"""
-            card_data = {
-                "name": "Medical Triage Agent A2A service",
-                "description": "A2A service for an AI agent that performs medical symptom triage and assessment using professional medical protocols",
-                "url": f"http://{request.host}",
-                "provider": {
-                    "organization": "Outshift",
-                    "url": f"http://{request.host}"
-                },
-                "iconUrl": f"http://{request.host}/icon.png",
-                "version": "1.0.0",
-                "documentationUrl": f"http://{request.host}/docs",
-                "capabilities": {
-                    "streaming": False,
-                    "pushNotifications": False,
-                    "stateTransitionHistory": False,
-                    "extensions": []
-                },
-                "securitySchemes": {
-                    "tbac": {
-                        "type": "http",
-                        "scheme": "bearer",
-                        "description": "Task-Based Access Control (TBAC)"
-                    } if self.enable_tbac else {
-                        "type": "http",
-                        "scheme": "none"
-                    }
-                },
-                "security": ["tbac"] if self.enable_tbac else [],
-                "defaultInputModes": ["text/plain", "application/json"],
-                "defaultOutputModes": ["text/plain", "application/json"],
-                "skills": [
-                    {
-                        "id": "medical-triage",
-                        "name": "Medical Symptom Triage A2A Service",
-                        "description": "Performs comprehensive medical symptom assessment and triage using AI-powered clinical protocols",
-                        "tags": ["healthcare", "triage", "medical", "symptoms", "diagnosis"],
-                        "examples": [
-                            "I have chest pain and shortness of breath",
-                            "My child has a fever and headache",
-                            "I'm experiencing severe abdominal pain"
-                        ],
-                        "inputModes": ["text/plain", "application/json"],
-                        "outputModes": ["text/plain", "application/json"]
-                    }
-                ],
-                "supportsAuthenticatedExtendedCard": False
-            }
-            
-            # Add TBAC status to card if enabled
-            if self.enable_tbac and self.tbac:
-                card_data["tbac_status"] = {
-                    "enabled": True,
-                    "client_authorized": self.tbac.is_client_authorized(),
-                    "a2a_authorized": self.tbac.is_a2a_authorized(),
-                    "fully_authorized": self.tbac.is_fully_authorized()
-                }
-            
-            return jsonify(card_data)
+            return _conditional_json_response(*self._agent_card_bytes(request.host))
         
         @self.app.route('/health', methods=['GET'])
         def health_check():
             """Health check endpoint with TBAC status"""
             health_data = {
                 "status": "healthy",
-                "timestamp": datetime.now().isoformat(),
+                "timestamp": _iso_now(),
                 "version": "1.0.0",
-                "active_tasks": len(self.tasks)
+                "active_tasks": self._task_count()
             }
             
             if self.enable_tbac and self.tbac:
@@ -321,76 +640,207 @@ class A2ATriageService:
                     "fully_authorized": self.tbac.is_fully_authorized()
                 }
             
-            return jsonify(health_data)
+            response = _json_response(health_data)
+            response.headers['Cache-Control'] = 'no-cache'
+            return response
+        
+        # Documentation never changes after startup
+        docs_body = orjson.dumps({
+            "title": "Medical Triage A2A Service",
+            "description": "Agent-to-Agent protocol service for medical symptom triage",
+            "tbac_enabled": self.enable_tbac,
+            "endpoints": {
+                "/.well-known/agent-card.json": "Agent discovery card",
+                "/health": "Health check",
+                "/docs": "This documentation",
+                "/": "JSON-RPC 2.0 endpoint for A2A communication (single or batch requests)"
+            },
+            "supported_methods": list(self._rpc_dispatch)
+        })
+        docs_etag = _etag_for(docs_body)
         
         @self.app.route('/docs', methods=['GET'])
         def documentation():
             """Basic documentation endpoint"""
-            return jsonify({
-                "title": "Medical Triage A2A Service",
-                "description": "Agent-to-Agent protocol service for medical symptom triage",
-                "tbac_enabled": self.enable_tbac,
-                "endpoints": {
-                    "/.well-known/agent-card.json": "Agent discovery card",
-                    "/health": "Health check",
-                    "/docs": "This documentation",
-                    "/": "JSON-RPC 2.0 endpoint for A2A communication"
-                },
-                "supported_methods": [
-                    "message/send",
-                    "tasks/get", 
-                    "tasks/cancel"
-                ]
-            })
+            return _conditional_json_response(docs_body, docs_etag)
         
         @self.app.route('/', methods=['POST'])
         def handle_jsonrpc():
             """Main JSON-RPC 2.0 endpoint for A2A protocol with TBAC"""
             try:
-                data = request.get_json()
-                
-                if not self._validate_jsonrpc_request(data):
-                    logger.warning(f"Invalid JSON-RPC request: {data}")
-                    return jsonify(self._create_error_response(
-                        data.get('id'), -32600, "Invalid Request"
+                try:
+                    data = orjson.loads(request.get_data())
+                except orjson.JSONDecodeError:
+                    logger.warning("Rejecting JSON-RPC request with malformed JSON body")
+                    return _json_response(self._create_error_response(
+                        None, -32700, "Parse error"
                     ))
                 
-                method = data['method']
-                params = data.get('params', {})
-                request_id = data['id']
+                if isinstance(data, list):
+                    return _json_response(self._handle_jsonrpc_batch(data))
                 
-                logger.info(f"Handling {method} request with ID {request_id}")
-                
-                # TBAC authorization check for incoming requests
-                if not self._check_authorization("receive_message"):
-                    return jsonify(self._create_tbac_error_response(request_id, "receive_message"))
-                
-                if method == 'message/send':
-                    return jsonify(self._handle_message_send(params, request_id))
-                elif method == 'tasks/get':
-                    return jsonify(self._handle_tasks_get(params, request_id))
-                elif method == 'tasks/cancel':
-                    return jsonify(self._handle_tasks_cancel(params, request_id))
-                else:
-                    logger.warning(f"Unknown method: {method}")
-                    return jsonify(self._create_error_response(
-                        request_id, -32601, "Method not found"
-                    ))
+                return _json_response(self._safe_dispatch_jsonrpc(data))
                     
             except Exception as e:
-                logger.error(f"Error handling JSON-RPC request: {e}", exc_info=True)
-                return jsonify(self._create_error_response(
+                logger.error("Error handling JSON-RPC request: %s", e, exc_info=True)
+                return _json_response(self._create_error_response(
                     None, -32603, "Internal error"
                 ))
         @self.app.errorhandler(404)
         def not_found(error):
-            return jsonify({"error": "Not found"}), 404
+            return _json_response({"error": "Not found"}, status=404)
 
         @self.app.errorhandler(500)
         def internal_error(error):
-            logger.error(f"Internal server error: {error}")
-            return jsonify({"error": "Internal server error"}), 500
+            logger.error("Internal server error: %s", error)
+            return _json_response({"error": "Internal server error"}, status=500)
 
+    def _get_task(self, task_id):
+        """Look up a task by ID, returning None if it doesn't exist"""
+        if not task_id:
+            return None
+        with self._lock:
+            return self.tasks.get(task_id)
+    
+    def _store_task(self, task):
+        """Insert or replace a task in storage"""
+        with self._lock:
+            self.tasks.set(task.id, task)
+    
+    def _task_count(self):
+        """Number of tasks currently held in storage"""
+        with self._lock:
+            return len(self.tasks)
+    
+    def _handle_jsonrpc_batch(self, batch):
+        """Handle a JSON-RPC 2.0 batch request
+        
+        Requests in a batch are independent by definition, so they run concurrently
+        on the worker pool. Responses are returned in the same order as the requests.
+        """
+        if not batch:
+            return self._create_error_response(None, -32600, "Invalid Request")
+        
+        logger.info("Handling JSON-RPC batch of %s requests", len(batch))
+        return list(self._executor.map(self._safe_dispatch_jsonrpc, batch))
+    
+    def _safe_dispatch_jsonrpc(self, data):
+        """Dispatch a single JSON-RPC request, converting unexpected errors into an error response"""
+        try:
+            return self._dispatch_jsonrpc(data)
+        except Exception as e:
+            logger.error("Error handling JSON-RPC request: %s", e, exc_info=True)
+            request_id = data.get('id') if isinstance(data, dict) else None
+            return self._create_error_response(request_id, -32603, "Internal error")
+    
+    def _dispatch_jsonrpc(self, data):
+        """Validate a single JSON-RPC request and route it to its method handler"""
+        if not self._validate_jsonrpc_request(data):
+            logger.warning("Invalid JSON-RPC request: %s", data)
+            request_id = data.get('id') if isinstance(data, dict) else None
+            return self._create_error_response(request_id, -32600, "Invalid Request")
+        
+        method = data['method']
+        params = data.get('params', {})
+        request_id = data['id']
+        
+        logger.info("Handling %s request with ID %s", method, request_id)
+        
+        # TBAC authorization check for incoming requests
+        if not self._check_authorization("receive_message"):
+            return self._create_tbac_error_response(request_id, "receive_message")
+        
+        handler = self._rpc_dispatch.get(method)
+        if handler is None:
+            logger.warning("Unknown method: %s", method)
+            return self._create_error_response(
+                request_id, -32601, "Method not found"
+            )
+        return handler(params, request_id)
+    
+    def _build_agent_card_template(self):
+        """Build the static part of the agent card; host-dependent URLs are filled in per request"""
+        return {
+            "name": "Medical Triage Agent A2A service",
+            "description": "A2A service for an AI agent that performs medical symptom triage and assessment using professional medical protocols",
+            "url": None,
+            "provider": None,
+            "iconUrl": None,
+            "version": "1.0.0",
+            "documentationUrl": None,
+            "capabilities": {
+                "streaming": False,
+                "pushNotifications": False,
+                "stateTransitionHistory": False,
+                "extensions": []
+            },
+            "securitySchemes": {
+                "tbac": {
+                    "type": "http",
+                    "scheme": "bearer",
+                    "description": "Task-Based Access Control (TBAC)"
+                } if self.enable_tbac else {
+                    "type": "http",
+                    "scheme": "none"
+                }
+            },
+            "security": ["tbac"] if self.enable_tbac else [],
+            "defaultInputModes": ["text/plain", "application/json"],
+            "defaultOutputModes": ["text/plain", "application/json"],
+            "skills": [
+                {
+                    "id": "medical-triage",
+                    "name": "Medical Symptom Triage A2A Service",
+                    "description": "Performs comprehensive medical symptom assessment and triage using AI-powered clinical protocols",
+                    "tags": ["healthcare", "triage", "medical", "symptoms", "diagnosis"],
+                    "examples": [
+                        "I have chest pain and shortness of breath",
+                        "My child has a fever and headache",
+                        "I'm experiencing severe abdominal pain"
+                    ],
+                    "inputModes": ["text/plain", "application/json"],
+                    "outputModes": ["text/plain", "application/json"]
+                }
+            ],
+            "supportsAuthenticatedExtendedCard": False
+        }
+    
+    def _agent_card_bytes(self, host):
+        """Serialized agent card and its ETag for a host, cached until the host or TBAC status changes"""
+        tbac_status = None
+        if self._tbac_active:
+            tbac_status = (self.tbac.is_client_authorized(), self.tbac.is_a2a_authorized())
+        
+        key = (host, tbac_status)
+        cached = self._card_cache.get(key)
+        if cached is not None:
+            return cached
+        
+        base_url = f"http://{host}"
+        card_data = dict(self._card_template)
+        card_data["url"] = base_url
+        card_data["provider"] = {"organization": "Outshift", "url": base_url}
+        card_data["iconUrl"] = f"{base_url}/icon.png"
+        card_data["documentationUrl"] = f"{base_url}/docs"
+        
+        # Add TBAC status to card if enabled
+        if tbac_status is not None:
+            client_authorized, a2a_authorized = tbac_status
+            card_data["tbac_status"] = {
+                "enabled": True,
+                "client_authorized": client_authorized,
+                "a2a_authorized": a2a_authorized,
+                "fully_authorized": client_authorized and a2a_authorized
+            }
+        
+        body = orjson.dumps(card_data)
+        cached = (body, _etag_for(body))
+        # The Host header is client controlled, so keep the cache small
+        if len(self._card_cache) >= 32:
+            self._card_cache.clear()
+        self._card_cache[key] = cached
+        return cached
+    
     def _validate_jsonrpc_request(self, data):
         """Validate JSON-RPC 2.0 request format"""
         if not isinstance(data, dict):
@@ -437,101 +887,176 @@ class A2ATriageService:
             parts = message.get('parts', [])
             task_id = message.get('taskId')
             context_id = message.get('contextId')
-            message_id = message.get('messageId', str(uuid.uuid4()))
+            message_id = message.get('messageId')
             
-            # Extract text from message parts
-            user_text = ""
-            for part in parts:
-                if part.get('kind') == 'text':
-                    user_text = part.get('text', '')
-                    break
+            # Extract text from message parts; text is almost always the first part
+            if parts and parts[0].get('kind') == 'text':
+                user_text = parts[0].get('text', '')
+            else:
+                user_text = next((p.get('text', '') for p in parts if p.get('kind') == 'text'), "")
+            
+            # A2A clients may set configuration.blocking=false to get the task back
+            # immediately and poll tasks/get while the triage API call runs
+            blocking = (params.get('configuration') or {}).get('blocking', True) is not False
+            
+            # Peers retry message/send with the same messageId after a timeout; answer
+            # the retry from the first result instead of calling the triage API again
+            dedup_key = (task_id, message_id) if message_id else None
+            if dedup_key is not None:
+                with self._lock:
+                    cached = self._recent_results.get(dedup_key)
+                if cached is not None:
+                    logger.info("Duplicate message %s - returning previous result", message_id)
+                    return self._create_success_response(request_id, cached)
             
-            logger.info(f"Processing message: '{user_text[:100]}...'")
+            logger.info("Processing message: '%s...'", user_text[:100])
             
-            if task_id and task_id in self.tasks:
-                return self._continue_existing_task(task_id, user_text, request_id, message)
+            if self._get_task(task_id) is not None:
+                response = self._continue_existing_task(task_id, user_text, request_id, message, blocking)
             else:
-                return self._create_new_task(user_text, context_id, request_id, message)
+                response = self._create_new_task(user_text, context_id, request_id, message, blocking)
+            
+            if dedup_key is not None and 'result' in response:
+                # Snapshot the result, since the task keeps changing after this response
+                snapshot = orjson.loads(orjson.dumps(response['result']))
+                with self._lock:
+                    self._recent_results.set(dedup_key, snapshot)
+            return response
                 
         except Exception as e:
-            logger.error(f"Error in message/send: {e}", exc_info=True)
+            logger.error("Error in message/send: %s", e, exc_info=True)
             return self._create_error_response(request_id, -32603, "Internal error")
     
-    def _create_new_task(self, user_text, context_id, request_id, original_message):
+    def _create_new_task(self, user_text, context_id, request_id, original_message, blocking=True):
         """Create a new triage task"""
-        task_id = str(uuid.uuid4())
+        # Task ids are time-ordered so the task store's insertion order matches id order
+        task_id = _uuid7()
+        message_id, new_context_id = _uuid4_batch(2)
         if not context_id:
-            context_id = str(uuid.uuid4())
+            context_id = new_context_id
         
-        logger.info(f"Creating new triage task {task_id}")
+        logger.info("Creating new triage task %s", task_id)
         
         # Create task structure
-        task = {
-            "id": task_id,
-            "contextId": context_id,
-            "status": {
-                "state": TaskState.SUBMITTED,
-                "timestamp": datetime.now().isoformat()
-            },
-            "history": [original_message],
-            "artifacts": [],
-            "metadata": {
-                "triage_token": None,
-                "survey_id": None,
-                "triage_state": "starting"
-            },
-            "kind": "task"
-        }
+        task = TriageTask(id=task_id, context_id=context_id)
+        task.history.append(original_message)
+        
+        if not blocking:
+            task.set_state(TaskState.WORKING)
+            self._store_task(task)
+            self._triage_workers.submit(self._run_task_step, self._start_task, task, user_text, message_id)
+            logger.info("Triage task %s queued for background start", task_id)
+            return self._create_success_response(request_id, task.to_a2a_dict())
+        
+        self._run_task_step(self._start_task, task, user_text, message_id)
+        self._store_task(task)
+        return self._create_success_response(request_id, task.to_a2a_dict())
+    
+    def _continue_existing_task(self, task_id, user_text, request_id, message, blocking=True):
+        """Continue an existing triage task"""
+        task = self._get_task(task_id)
+        
+        logger.info("Continuing task %s, current state: %s", task_id, task.status.state)
         
+        with self._lock:
+            # Check if task is in a terminal state
+            if task.status.state in _TERMINAL_STATES:
+                logger.warning("Task %s is in terminal state: %s", task_id, task.status.state)
+                return self._create_error_response(request_id, -32002, "Task cannot be continued")
+            
+            # The triage survey is a sequential conversation; one call in flight at a time
+            if task.status.state == TaskState.WORKING:
+                if blocking:
+                    logger.warning("Task %s is still processing the previous message", task_id)
+                    return self._create_error_response(request_id, -32002, "Task is still processing the previous message")
+                
+                # Coalesced into the next triage API call once the current one returns
+                task.history.append(message)
+                task.pending_messages.append(user_text)
+                logger.info("Task %s busy - queued message (%s pending)", task_id, len(task.pending_messages))
+                return self._create_success_response(request_id, task.to_a2a_dict())
+            
+            task.set_state(TaskState.WORKING)
+            task.history.append(message)
+        
+        if not blocking:
+            self._triage_workers.submit(self._run_task_step, self._drain_task_messages, task, user_text)
+            logger.info("Task %s message queued for background processing", task_id)
+            return self._create_success_response(request_id, task.to_a2a_dict())
+        
+        self._run_task_step(self._drain_task_messages, task, user_text)
+        return self._create_success_response(request_id, task.to_a2a_dict())
+    
+    def _run_task_step(self, step, task, *args):
+        """Run a triage step for a task, failing the task rather than leaving it WORKING on error"""
+        try:
+            step(task, *args)
+        except Exception as e:
+            logger.error("Error processing task %s: %s", task.id, e, exc_info=True)
+            self._fail_task(task)
+    
+    def _fail_task(self, task):
+        """Mark a task FAILED unless it already ended (e.g. canceled meanwhile), dropping its queued messages"""
+        with self._lock:
+            if task.status.state not in _TERMINAL_STATES:
+                task.set_state(TaskState.FAILED)
+        self._drop_pending_messages(task)
+    
+    def _start_task(self, task, user_text, message_id):
+        """Start the external triage session for a new task"""
         # Extract demographics from user input
         demographics = self._extract_demographics(user_text)
         age = demographics.get('age', 64)
         sex = demographics.get('sex', 'female')
         
-        logger.info(f"Starting triage session with age={age}, sex={sex}")
+        logger.info("Starting triage session with age=%s, sex=%s", age, sex)
         
         # Start external triage session
         result = self._start_triage_session(age, sex, user_text, task)
         
         if result['success']:
-            task['metadata'].update(result['metadata'])
-            task['status']['state'] = TaskState.INPUT_REQUIRED
-            
             # Create agent response message
             agent_message = {
                 "role": "agent",
                 "parts": [{"kind": "text", "text": result['response']}],
-                "messageId": str(uuid.uuid4()),
-                "taskId": task_id,
-                "contextId": context_id,
+                "messageId": message_id,
+                "taskId": task.id,
+                "contextId": task.context_id,
                 "kind": "message"
             }
-            task['history'].append(agent_message)
-            task['status']['message'] = agent_message
-            task['metadata']['triage_state'] = 'in_progress'
             
-            logger.info(f"Triage task {task_id} started successfully")
+            with self._lock:
+                if task.status.state == TaskState.CANCELED:
+                    logger.info("Task %s was canceled while the triage session started", task.id)
+                    return
+                
+                task.triage_token = result['metadata']['triage_token']
+                task.survey_id = result['metadata']['survey_id']
+                task.history.append(agent_message)
+                task.status.message = agent_message
+                task.triage_state = 'in_progress'
+            
+            logger.info("Triage task %s started successfully", task.id)
+            
+            # Messages sent while the session was starting go out as the first answer
+            queued_text = self._await_more_input(task)
+            if queued_text is not None:
+                self._drain_task_messages(task, queued_text)
         else:
-            task['status']['state'] = TaskState.FAILED
-            logger.error(f"Failed to start triage for task {task_id}: {result.get('error')}")
-        
-        self.tasks[task_id] = task
-        return self._create_success_response(request_id, task)
+            logger.error("Failed to start triage for task %s: %s", task.id, result.get('error'))
+            self._fail_task(task)
     
-    def _continue_existing_task(self, task_id, user_text, request_id, message):
-        """Continue an existing triage task"""
-        task = self.tasks[task_id]
-        
-        logger.info(f"Continuing task {task_id}, current state: {task['status']['state']}")
-        
-        # Check if task is in a terminal state
-        if task['status']['state'] in [TaskState.COMPLETED, TaskState.FAILED, TaskState.CANCELED]:
-            logger.warning(f"Task {task_id} is in terminal state: {task['status']['state']}")
-            return self._create_error_response(request_id, -32002, "Task cannot be continued")
-        
-        task['history'].append(message)
+    def _drain_task_messages(self, task, user_text):
+        """Process a message, then send any that arrived in the meantime as one combined message"""
+        while user_text is not None:
+            user_text = self._process_task_message(task, user_text)
+    
+    def _process_task_message(self, task, user_text):
+        """Send a user message for an existing task to the external triage API
         
-        # Send message to external triage API
+        Returns the combined text of messages queued meanwhile, which the caller
+        sends next, or None once the task has left WORKING.
+        """
         result = self._send_triage_message(task, user_text)
         
         if result['success']:
@@ -539,92 +1064,134 @@ class A2ATriageService:
             agent_message = {
                 "role": "agent",
                 "parts": [{"kind": "text", "text": result['response']}],
-                "messageId": str(uuid.uuid4()),
-                "taskId": task_id,
-                "contextId": task['contextId'],
+                "messageId": _uuid4_batch(1)[0],
+                "taskId": task.id,
+                "contextId": task.context_id,
                 "kind": "message"
             }
-            task['history'].append(agent_message)
-            task['status']['message'] = agent_message
             
             # Map external triage state to A2A task state
             external_state = result.get('state', 'in_progress')
-            task['metadata']['triage_state'] = external_state
-            
-            logger.info(f"External triage state: {external_state}")
             
-            if external_state == 'present_result':
-                logger.info("Triage completed - transitioning to COMPLETED state")
-                task['status']['state'] = TaskState.COMPLETED
-                
-                # Get triage summary and create artifact
-                summary_result = self._get_triage_summary(task)
-                artifact_data = {
-                    "urgency_level": summary_result.get('urgency_level', 'standard'),
-                    "doctor_type": summary_result.get('doctor_type', 'general practitioner'),
-                    "notes": summary_result.get('notes', 'Triage assessment completed'),
-                    "completed_at": datetime.now().isoformat()
-                }
+            with self._lock:
+                if task.status.state == TaskState.CANCELED:
+                    logger.info("Task %s was canceled while waiting on the triage API", task.id)
+                    return None
                 
-                artifact = {
-                    "artifactId": str(uuid.uuid4()),
-                    "name": "Medical Triage Assessment",
-                    "description": "Results from medical triage evaluation",
-                    "parts": [
-                        {
-                            "kind": "data",
-                            "data": artifact_data
-                        }
-                    ]
+                task.history.append(agent_message)
+                task.status.message = agent_message
+                task.triage_state = external_state
+            
+            logger.info("External triage state: %s", external_state)
+            
+            handler = self._external_state_handlers.get(external_state, self._await_more_input)
+            return handler(task)
+        
+        logger.error("Failed to process triage message for task %s: %s", task.id, result.get('error'))
+        self._fail_task(task)
+        return None
+    
+    def _finalize_completed_task(self, task):
+        """Attach the triage summary as an artifact, then mark the task completed"""
+        logger.info("Triage completed - fetching summary before COMPLETED")
+        
+        # Get triage summary and create artifact first, so no reader ever sees
+        # a COMPLETED task without its results
+        summary_result = self._get_triage_summary(task)
+        artifact_data = {
+            "urgency_level": summary_result.get('urgency_level', 'standard'),
+            "doctor_type": summary_result.get('doctor_type', 'general practitioner'),
+            "notes": summary_result.get('notes', 'Triage assessment completed'),
+            "completed_at": _iso_now()
+        }
+        
+        artifact = {
+            "artifactId": _uuid4_batch(1)[0],
+            "name": "Medical Triage Assessment",
+            "description": "Results from medical triage evaluation",
+            "parts": [
+                {
+                    "kind": "data",
+                    "data": artifact_data
                 }
-                task['artifacts'] = [artifact]
-                
-                logger.info(f"Task {task_id} completed with triage results")
-                
-            elif external_state == 'in_progress':
-                task['status']['state'] = TaskState.INPUT_REQUIRED
-                logger.info(f"Task {task_id} waiting for more user input")
-                
-            elif external_state == 'post_result':
-                logger.warning("Received post_result state - task should already be completed")
-                task['status']['state'] = TaskState.COMPLETED
-                
-            else:
-                task['status']['state'] = TaskState.INPUT_REQUIRED
-                
-        else:
-            task['status']['state'] = TaskState.FAILED
-            logger.error(f"Failed to process triage message for task {task_id}: {result.get('error')}")
+            ]
+        }
+        with self._lock:
+            if task.status.state == TaskState.CANCELED:
+                logger.info("Task %s was canceled while the triage summary was fetched", task.id)
+                return None
+            task.artifacts = [artifact]
+            task.set_state(TaskState.COMPLETED)
+        
+        logger.info("Task %s completed with triage results", task.id)
+        self._drop_pending_messages(task)
+        return None
+    
+    def _handle_post_result(self, task):
+        """Handle a post_result state, which should only follow a completed triage"""
+        logger.warning("Received post_result state - task should already be completed")
+        with self._lock:
+            if task.status.state != TaskState.CANCELED:
+                task.set_state(TaskState.COMPLETED)
+        self._drop_pending_messages(task)
+        return None
+    
+    def _await_more_input(self, task):
+        """Keep the task open for the next user message, or return the messages queued meanwhile
         
-        return self._create_success_response(request_id, task)
+        The next state is chosen under the same lock that _continue_existing_task
+        queues under, so a message arriving now is either returned here or sees
+        INPUT_REQUIRED and starts its own call - never both.
+        """
+        with self._lock:
+            if task.status.state == TaskState.CANCELED:
+                task.pending_messages.clear()
+                return None
+            
+            if task.pending_messages:
+                # Stay WORKING; the caller sends the queued messages as one call
+                user_text = "\n".join(task.pending_messages)
+                logger.info("Task %s: sending %s queued messages in one call", task.id, len(task.pending_messages))
+                task.pending_messages.clear()
+                return user_text
+            
+            task.set_state(TaskState.INPUT_REQUIRED)
+        logger.info("Task %s waiting for more user input", task.id)
+        return None
+    
+    def _drop_pending_messages(self, task):
+        """Discard messages queued for a task that has reached a terminal state"""
+        with self._lock:
+            if task.pending_messages:
+                logger.warning("Task %s ended with %s queued messages unsent", task.id, len(task.pending_messages))
+                task.pending_messages.clear()
     
     def _extract_demographics(self, text):
         """Extract age and sex from user input text"""
         demographics = {}
+        text_lower = text.lower()
         
-        # Age extraction patterns
-        age_patterns = [
-            r'\b(\d{1,2})\s*(?:years?\s*old|yo)\b',
-            r'\bage\s*(?:is\s*)?(\d{1,2})\b',
-            r'\bi\s*am\s*(\d{1,2})\b'
-        ]
-        
-        for pattern in age_patterns:
-            match = re.search(pattern, text.lower())
+        # Age extraction
+        for pattern in _AGE_PATTERNS:
+            match = pattern.search(text_lower)
             if match:
                 age = int(match.group(1))
                 if 1 <= age <= 120:
                     demographics['age'] = age
                     break
         
-        # Sex extraction
-        text_lower = text.lower()
-        if any(word in text_lower for word in ['male', 'man', 'boy', 'he', 'his', 'him']):
-            demographics['sex'] = 'male'
-        elif any(word in text_lower for word in ['female', 'woman', 'girl', 'she', 'her']):
-            demographics['sex'] = 'female'
+        # Sex extraction in a single scan over whole words; any male word wins
+        female_seen = False
+        for match in _SEX_PATTERN.finditer(text_lower):
+            if match.group(1):
+                demographics['sex'] = 'male'
+                break
+            female_seen = True
+        else:
+            if female_seen:
+                demographics['sex'] = 'female'
         
-        logger.info(f"Extracted demographics: {demographics}")
+        logger.info("Extracted demographics: %s", demographics)
         return demographics
     
     def _start_triage_session(self, age, sex, complaint, task):
@@ -644,38 +1211,30 @@ class A2ATriageService:
                 }
             }
         except Exception as e:
-            logger.error(f"Error starting triage session: {e}", exc_info=True)
+            logger.error("Error starting triage session: %s", e, exc_info=True)
             return {'success': False, 'error': str(e)}
     
     def _send_triage_message(self, task, message):
         """Send message to external triage API"""
         try:
-            token = task['metadata']['triage_token']
-            survey_id = task['metadata']['survey_id']
-            
-            result = self._send_triage_api_message(token, survey_id, message)
+            result = self._send_triage_api_message(task.triage_token, task.survey_id, message)
             return result
         except Exception as e:
-            logger.error(f"Error sending triage message: {e}", exc_info=True)
+            logger.error("Error sending triage message: %s", e, exc_info=True)
             return {'success': False, 'error': str(e)}
     
     def _get_triage_summary(self, task):
         """Get triage summary from external API with timing"""
         try:
-            token = task['metadata']['triage_token']
-            survey_id = task['metadata']['survey_id']
-            
-            headers = {"Authorization": f"Bearer {token}"}
-            
-            response, elapsed = self._timed_external_request(
-                'GET', f"{self.triage_base_url}/surveys/{survey_id}/summary", 
+            response, elapsed_us = self._timed_external_request(
+                'GET', f"{self.triage_base_url}/surveys/{task.survey_id}/summary", 
                 "Get Triage Summary",
-                headers=headers, timeout=30
+                headers=self._bearer_headers(task.triage_token)
             )
             
             if response.status_code == 200:
-                data = response.json()
-                logger.info(f"Triage summary retrieved successfully")
+                data = orjson.loads(response.content)
+                logger.info("Triage summary retrieved successfully")
                 return {
                     'success': True,
                     'urgency_level': data.get('urgency', 'standard'),
@@ -683,84 +1242,93 @@ class A2ATriageService:
                     'notes': data.get('notes', 'Assessment completed')
                 }
             else:
-                logger.warning(f"Failed to get triage summary: {response.status_code}")
+                logger.warning("Failed to get triage summary: %s", response.status_code)
                 return {'success': False}
         except Exception as e:
-            logger.error(f"Error getting triage summary: {e}", exc_info=True)
+            logger.error("Error getting triage summary: %s", e, exc_info=True)
             return {'success': False}
     
     def _get_triage_token(self):
-        """Get authentication token from external triage API with timing"""
-        logger.info("Requesting triage API authentication token")
-        
-        creds = base64.b64encode(f"{self.triage_app_id}:{self.triage_app_key}".encode()).decode()
-        headers = {
-            "Content-Type": "application/json",
-            "Authorization": f"Basic {creds}",
-            "instance-id": self.triage_instance_id
-        }
-        payload = {"grant_type": "client_credentials"}
-        
-        response, elapsed = self._timed_external_request(
-            'POST', self.triage_token_url, "Get OAuth Token",
-            headers=headers, json=payload, timeout=30
-        )
-        
-        if response.status_code == 200:
-            token = response.json()['access_token']
-            logger.info(f"Successfully obtained triage API token")
-            return token
+        """Get authentication token from external triage API, reusing the cached one until it expires"""
+        cache = self._triage_token_cache
+        if time.monotonic() < cache["expires_at"] - TOKEN_EXPIRY_SKEW:
+            return cache["token"]
         
-        raise Exception(f"Failed to get token: {response.status_code} - {response.text}")
+        with self._triage_token_lock:
+            # Another request may have refreshed the token while we waited
+            if time.monotonic() < cache["expires_at"] - TOKEN_EXPIRY_SKEW:
+                return cache["token"]
+            
+            logger.info("Requesting triage API authentication token")
+            
+            payload = {"grant_type": "client_credentials"}
+            
+            response, elapsed_us = self._timed_external_request(
+                'POST', self.triage_token_url, "Get OAuth Token",
+                headers=self._triage_token_headers, data=orjson.dumps(payload)
+            )
+            
+            if response.status_code == 200:
+                data = orjson.loads(response.content)
+                token = data['access_token']
+                try:
+                    expires_in = float(data.get('expires_in', 3600))
+                except (TypeError, ValueError):
+                    expires_in = 3600
+                cache["token"] = token
+                cache["expires_at"] = time.monotonic() + expires_in
+                logger.info("Successfully obtained triage API token (expires in %.0fs)", expires_in)
+                return token
+            
+            raise Exception(f"Failed to get token: {response.status_code} - {_body_snippet(response)}")
+    
+    def _prefetch_triage_token(self):
+        """Fetch the triage token ahead of the first task so session start skips the OAuth round trip"""
+        try:
+            self._get_triage_token()
+        except Exception as e:
+            logger.warning("Triage token prefetch failed, will retry on first task: %s", e)
     
     def _create_triage_survey(self, token, age, sex):
         """Create a new triage survey with timing"""
-        logger.info(f"Creating triage survey - age={age}, sex={sex}")
+        logger.info("Creating triage survey - age=%s, sex=%s", age, sex)
         
-        headers = {
-            "Authorization": f"Bearer {token}",
-            "Content-Type": "application/json"
-        }
         payload = {
             "sex": sex.lower(),
             "age": {"value": age, "unit": "year"}
         }
         
-        response, elapsed = self._timed_external_request(
+        response, elapsed_us = self._timed_external_request(
             'POST', f"{self.triage_base_url}/surveys", "Create Survey",
-            headers=headers, json=payload, timeout=30
+            headers=self._bearer_headers(token), data=orjson.dumps(payload)
         )
         
         if response.status_code == 200:
-            survey_id = response.json()['survey_id']
-            logger.info(f"Successfully created triage survey: {survey_id}")
+            survey_id = orjson.loads(response.content)['survey_id']
+            logger.info("Successfully created triage survey: %s", survey_id)
             return survey_id
         
-        raise Exception(f"Failed to create survey: {response.status_code} - {response.text}")
+        raise Exception(f"Failed to create survey: {response.status_code} - {_body_snippet(response)}")
     
     def _send_triage_api_message(self, token, survey_id, message):
         """Send message to external triage API with timing"""
-        logger.info(f"Sending message to triage API: '{message[:50]}...'")
+        logger.info("Sending message to triage API: '%s...'", message[:50])
         
-        headers = {
-            "Authorization": f"Bearer {token}",
-            "Content-Type": "application/json"
-        }
         payload = {"user_message": message}
         
-        response, elapsed = self._timed_external_request(
+        response, elapsed_us = self._timed_external_request(
             'POST', f"{self.triage_base_url}/surveys/{survey_id}/messages", 
             "Send Message",
-            headers=headers, json=payload, timeout=30
+            headers=self._bearer_headers(token), data=orjson.dumps(payload)
         )
         
         if response.status_code == 200:
-            data = response.json()
+            data = orjson.loads(response.content)
             external_state = data.get('survey_state', 'in_progress')
             agent_response = data.get('assistant_message', '')
             
-            logger.info(f"Triage state: {external_state}")
-            logger.info(f"Triage response length: {len(agent_response)} chars")
+            logger.info("Triage state: %s", external_state)
+            logger.info("Triage response length: %s chars", len(agent_response))
             
             return {
                 "success": True,
@@ -768,7 +1336,7 @@ class A2ATriageService:
                 "state": external_state
             }
         else:
-            logger.error(f"Triage API error: {response.status_code} - {response.text}")
+            logger.error("Triage API error: %s - %s", response.status_code, _body_snippet(response))
             return {
                 "success": False,
                 "response": "I'm having trouble with the medical assessment system."
@@ -777,54 +1345,55 @@ class A2ATriageService:
     def _handle_tasks_get(self, params, request_id):
         """Handle tasks/get JSON-RPC method"""
         task_id = params.get('id')
-        if not task_id or task_id not in self.tasks:
-            logger.warning(f"Task not found: {task_id}")
+        task = self._get_task(task_id)
+        if task is None:
+            logger.warning("Task not found: %s", task_id)
             return self._create_error_response(request_id, -32001, "Task not found")
         
-        task = self.tasks[task_id]
         history_length = params.get('historyLength', 10)
         
-        # Limit history if requested
-        if history_length and len(task.get('history', [])) > history_length:
-            task_copy = task.copy()
-            task_copy['history'] = task['history'][-history_length:]
-            return self._create_success_response(request_id, task_copy)
-        
-        logger.info(f"Retrieved task {task_id}")
-        return self._create_success_response(request_id, task)
+        logger.info("Retrieved task %s", task_id)
+        return self._create_success_response(request_id, task.to_a2a_dict(history_length))
     
     def _handle_tasks_cancel(self, params, request_id):
         """Handle tasks/cancel JSON-RPC method"""
         task_id = params.get('id')
-        if not task_id or task_id not in self.tasks:
-            logger.warning(f"Task not found for cancellation: {task_id}")
+        task = self._get_task(task_id)
+        if task is None:
+            logger.warning("Task not found for cancellation: %s", task_id)
             return self._create_error_response(request_id, -32001, "Task not found")
         
-        task = self.tasks[task_id]
-        
-        # Check if task can be cancelled
-        if task['status']['state'] in [TaskState.COMPLETED, TaskState.FAILED, TaskState.CANCELED]:
-            logger.warning(f"Task {task_id} cannot be cancelled - in terminal state")
-            return self._create_error_response(request_id, -32002, "Task cannot be canceled")
-        
-        # Cancel the task
-        task['status']['state'] = TaskState.CANCELED
-        task['status']['timestamp'] = datetime.now().isoformat()
+        # Check and cancel in one step; in-flight workers re-check under the same
+        # lock before their next transition, so a canceled task stays canceled
+        with self._lock:
+            if task.status.state in _TERMINAL_STATES:
+                logger.warning("Task %s cannot be cancelled - in terminal state", task_id)
+                return self._create_error_response(request_id, -32002, "Task cannot be canceled")
+            
+            task.set_state(TaskState.CANCELED)
+            task.pending_messages.clear()
         
-        logger.info(f"Task {task_id} cancelled")
-        return self._create_success_response(request_id, task)
+        logger.info("Task %s cancelled", task_id)
+        return self._create_success_response(request_id, task.to_a2a_dict())
 
     def run(self):
         """Run the Flask application"""
-        logger.info(f"Starting A2A Triage Service on {self.host}:{self.port}")
-        logger.info(f"TBAC enabled: {self.enable_tbac}")
+        logger.info("Starting A2A Triage Service on %s:%s", self.host, self.port)
+        logger.info("TBAC enabled: %s", self.enable_tbac)
         
         if self.enable_tbac and self.tbac:
-            logger.info(f"TBAC Status - client authorized: {self.tbac.is_client_authorized()}")
-            logger.info(f"TBAC Status - A2A authorized: {self.tbac.is_a2a_authorized()}")
+            logger.info("TBAC Status - client authorized: %s", self.tbac.is_client_authorized())
+            logger.info("TBAC Status - A2A authorized: %s", self.tbac.is_a2a_authorized())
         
-        logger.info(f"Agent card available at: http://{self.host}:{self.port}/.well-known/agent-card.json")
-        logger.info(f"Health check available at: http://{self.host}:{self.port}/health")
+        logger.info("Agent card available at: http://%s:%s/.well-known/agent-card.json", self.host, self.port)
+        logger.info("Health check available at: http://%s:%s/health", self.host, self.port)
+        
+        if not self.debug and _gevent_patched():
+            # Cooperative server: each in-flight triage API call only parks its own greenlet
+            from gevent.pywsgi import WSGIServer
+            logger.info("Serving with gevent WSGIServer")
+            WSGIServer((self.host, self.port), self.app, log=None).serve_forever()
+            return
         
         # Run Flask app
         self.app.run(
@@ -834,6 +1403,34 @@ class A2ATriageService:
             use_reloader=False
         )
 
+def _gevent_patched():
+    """Check whether the socket module has been monkey-patched by gevent"""
+    try:
+        from gevent import monkey
+    except ImportError:
+        return False
+    return monkey.is_module_patched('socket')
+
+def create_app():
+    """WSGI application factory for production servers
+    
+    Example: gunicorn -c gunicorn.conf.py 'tbac_a2aservice:create_app()'
+    Set DISABLE_TBAC=true to run without TBAC authorization.
+    """
+    load_dotenv()
+    enable_tbac = os.getenv('DISABLE_TBAC', 'false').lower() != 'true'
+    return A2ATriageService(enable_tbac=enable_tbac).app
+
+def create_asgi_app():
+    """ASGI application factory wrapping the Flask app for ASGI servers
+    
+    Example: uvicorn --factory --loop uvloop --http httptools 'tbac_a2aservice:create_asgi_app'
+    Routes still run synchronously, on asgiref's worker threads; only HTTP
+    parsing and connection handling move to the ASGI server. Requires asgiref.
+    """
+    from asgiref.wsgi import WsgiToAsgi
+    return WsgiToAsgi(create_app())
+
 def main():
     """Main entry point"""
     import argparse
@@ -843,6 +1440,8 @@ def main():
     parser.add_argument('--port', type=int, default=8887, help='Port to bind to (default: 8887)')
     parser.add_argument('--debug', action='store_true', help='Enable debug mode')
     parser.add_argument('--disable-tbac', action='store_true', help='Disable TBAC authorization')
+    parser.add_argument('--connect-timeout', type=float, default=3.0, help='Triage API connect timeout in seconds (default: 3)')
+    parser.add_argument('--read-timeout', type=float, default=27.0, help='Triage API read timeout in seconds (default: 27)')
     
     args = parser.parse_args()
     
@@ -851,11 +1450,13 @@ def main():
             host=args.host,
             port=args.port,
             debug=args.debug,
-            enable_tbac=not args.disable_tbac
+            enable_tbac=not args.disable_tbac,
+            connect_timeout=args.connect_timeout,
+            read_timeout=args.read_timeout
         )
         service.run()
     except Exception as e:
-        logger.error(f"Failed to start service: {e}", exc_info=True)
+        logger.error("Failed to start service: %s", e, exc_info=True)
         exit(1)
 
 if __name__ == "__main__":
@@ -1,20 +1,43 @@
 """
 Healthcare Voice (LLM) + A2A Triage + MCP Insurance
 """
+import sys
+
+# The triage service serves concurrent sessions with gevent when it is installed:
+# patch the standard library before anything imports sockets, so blocking triage
+# API calls yield to other requests. The voice agent runs on asyncio and is not patched.
+if __name__ == "__main__" and sys.argv[1:2] == ["service"]:
+    try:
+        from gevent import monkey
+        monkey.patch_all()
+    except ImportError:
+        pass
+
 import asyncio
-import json
+import atexit
+import io
+import logging
+import logging.handlers
 import os
+import queue
 import re
 import base64
-import uuid
-import random
+import secrets
 import string
-import tempfile
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from functools import lru_cache
 from typing import Dict
 
+import httpx
+import orjson
 import requests
-from flask import Flask, request, jsonify
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from flask import Flask, Response, request
 
 # Audio imports with fallback
 try:
@@ -25,6 +48,40 @@ try:
 except ImportError:
     AUDIO_AVAILABLE = False
 
+# Optional local TTS: set PIPER_VOICE to a Piper .onnx voice to use it instead of gTTS
+try:
+    from piper.voice import PiperVoice
+    import sounddevice as sd
+    PIPER_AVAILABLE = True
+except ImportError:
+    PIPER_AVAILABLE = False
+
+# Optional local ASR: set WHISPER_MODEL (e.g. base.en) to transcribe with faster-whisper
+try:
+    from faster_whisper import WhisperModel
+    import numpy as np
+    import sounddevice as sd
+    import webrtcvad
+    WHISPER_AVAILABLE = True
+except ImportError:
+    WHISPER_AVAILABLE = False
+
+# Local ASR capture: 20ms frames at 16kHz, matching the listen timeouts of the Google path
+ASR_RATE = 16000
+ASR_FRAME = 320
+ASR_START_FRAMES = 250     # 5s to start speaking
+ASR_PHRASE_FRAMES = 300    # 6s phrase limit
+ASR_SILENCE_FRAMES = 25    # 500ms of silence ends the phrase
+ASR_PREROLL_FRAMES = 10    # keep 200ms before the first voiced frame
+ASR_PAUSE_FRAMES = 10      # 200ms of silence: transcribe early, final if no speech follows
+
+# What listen() returns instead of a transcript when nothing usable was heard
+_LISTEN_FAILURES = frozenset({"UNCLEAR", "TIMEOUT", "ERROR"})
+
+# Set LLM_SPECULATION=1 to start the LLM on the transcript at the first pause,
+# before end of speech is confirmed (costs an extra LLM call when the user continues)
+LLM_SPECULATION = os.getenv('LLM_SPECULATION') == '1'
+
 # Load environment
 def load_env():
     try:
@@ -35,100 +92,280 @@ def load_env():
 
 load_env()
 
+# Logging
+def setup_logging():
+    """Log to stderr from a listener thread, so the event loop only puts records on a queue.
+    Set LOG_LEVEL=DEBUG for payloads and session data. Does nothing if logging is configured."""
+    root = logging.getLogger()
+    if root.handlers:
+        return
+    
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(logging.Formatter('%(message)s'))
+    log_queue = queue.SimpleQueue()
+    listener = logging.handlers.QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    
+    root.setLevel(os.getenv('LOG_LEVEL', 'INFO').upper())
+    root.addHandler(logging.handlers.QueueHandler(log_queue))
+    listener.start()
+    # Flush queued records on shutdown
+    atexit.register(listener.stop)
+
+setup_logging()
+logger = logging.getLogger(__name__)
+
+# HTTP
+def create_http_session(pool_maxsize=16):
+    """Session that keeps connections alive between calls and retries failed connects"""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_maxsize=pool_maxsize, max_retries=Retry(total=2, backoff_factor=0.2))
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+def create_async_http_client(timeout=30):
+    """Async client that keeps connections alive between calls and retries failed connects"""
+    transport = httpx.AsyncHTTPTransport(
+        http2=True,
+        retries=2,
+        limits=httpx.Limits(max_connections=16, max_keepalive_connections=16)
+    )
+    return httpx.AsyncClient(timeout=timeout, transport=transport)
+
 # Session
+class SessionData(dict):
+    """Collected session fields; counts assignments and remembers the ones not yet logged"""
+    
+    __slots__ = ('version', 'pending', 'filled')
+    
+    def __init__(self):
+        super().__init__()
+        self.version = 0
+        self.pending = {}
+        self.filled = set()
+    
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        self.version += 1
+        self.pending[key] = value
+        if value:
+            self.filled.add(key)
+        else:
+            self.filled.discard(key)
+    
+    def missing(self, fields):
+        """Return the given fields that have no value yet, in order"""
+        return [key for key in fields if key not in self.filled]
+    
+    def take_changes(self):
+        """Return the fields assigned since the last call"""
+        changes, self.pending = self.pending, {}
+        return changes
+
 class Session:
+    """Patient session; the transcript is appended to a JSONL file as it happens,
+    and a small metadata JSON file is rewritten on save. Transcript entries are
+    stamped with integer epoch nanoseconds ("ts_ns") and carry the data version
+    plus any fields set since the previous entry, so the data at any point can
+    be rebuilt by replaying "data_changes" from the start."""
+    
+    AUTOSAVE_EVERY = 5
+    
+    __slots__ = ('id', 'data', 'triage_complete', 'triage_attempts', 'age', 'sex',
+                 'interaction_count', 'start_time', 'file_prefix', '_transcript')
+    
     def __init__(self):
-        self.id = str(uuid.uuid4())[:8]
-        self.data = {}
+        self.id = secrets.token_hex(4)
+        self.data = SessionData()
         self.triage_complete = False
         self.triage_attempts = 0
-        self.conversation_log = []
+        # Triage demographics, set when the DOB and name are extracted
+        self.age = None
+        self.sex = None
+        self.interaction_count = 0
         self.start_time = datetime.now()
+        self.file_prefix = f"sessions/session_{self.start_time.strftime('%Y%m%d_%H%M%S')}_{self.id}"
+        self._transcript = None
     
     def add_interaction(self, role, message, extra_data=None):
         interaction = {
-            "timestamp": datetime.now().isoformat(),
+            "ts_ns": time.time_ns(),
             "role": role,
             "message": message,
-            "session_data_snapshot": self.data.copy()
+            "data_version": self.data.version
         }
+        changes = self.data.take_changes()
+        if changes:
+            interaction["data_changes"] = changes
         if extra_data:
             interaction["extra_data"] = extra_data
-        self.conversation_log.append(interaction)
-        print(f"SESSION-LOG: {role.upper()} - {message[:100]}...")
+        self._append_transcript(interaction)
+        self.interaction_count += 1
+        logger.debug("SESSION-LOG: %s - %s...", role.upper(), message[:100])
+        
+        if self.interaction_count % self.AUTOSAVE_EVERY == 0:
+            try:
+                self._write_metadata()
+            except Exception as e:
+                logger.warning("SESSION: Autosave failed: %s", e)
+    
+    def _append_transcript(self, interaction):
+        try:
+            if self._transcript is None:
+                os.makedirs("sessions", exist_ok=True)
+                # Unbuffered: each entry is a single write, so it reaches disk as it happens
+                self._transcript = open(f"{self.file_prefix}.jsonl", 'ab', buffering=0)
+            self._transcript.write(orjson.dumps(interaction, default=str, option=orjson.OPT_APPEND_NEWLINE))
+        except Exception as e:
+            logger.warning("SESSION: Transcript write failed: %s", e)
+    
+    def _write_metadata(self):
+        """Write the metadata file atomically via a temp file; returns its path"""
+        os.makedirs("sessions", exist_ok=True)
+        filename = f"{self.file_prefix}.json"
+        now = datetime.now()
+        
+        session_data = {
+            "session_id": self.id,
+            "start_time": self.start_time.isoformat(),
+            "end_time": now.isoformat(),
+            "duration_minutes": (now - self.start_time).total_seconds() / 60,
+            "final_data": self.data,
+            "triage_complete": self.triage_complete,
+            "triage_attempts": self.triage_attempts,
+            "transcript_file": f"{self.file_prefix}.jsonl",
+            "data_fields_collected": list(self.data.keys()),
+            "total_interactions": self.interaction_count
+        }
+        
+        with open(f"{filename}.tmp", 'wb') as f:
+            f.write(orjson.dumps(session_data, option=orjson.OPT_INDENT_2, default=str))
+        os.replace(f"{filename}.tmp", filename)
+        return filename
     
     def save_to_file(self):
         try:
-            os.makedirs("sessions", exist_ok=True)
-            filename = f"sessions/session_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{self.id}.json"
+            filename = self._write_metadata()
+            if self._transcript is not None:
+                # Entries were written as they happened; make sure they are on disk at call end
+                os.fsync(self._transcript.fileno())
+                self._transcript.close()
+                self._transcript = None
             
-            session_data = {
-                "session_id": self.id,
-                "start_time": self.start_time.isoformat(),
-                "end_time": datetime.now().isoformat(),
-                "duration_minutes": (datetime.now() - self.start_time).total_seconds() / 60,
-                "final_data": self.data,
-                "triage_complete": self.triage_complete,
-                "triage_attempts": self.triage_attempts,
-                "conversation_log": self.conversation_log,
-                "data_fields_collected": list(self.data.keys()),
-                "total_interactions": len(self.conversation_log)
-            }
-            
-            with open(filename, 'w') as f:
-                json.dump(session_data, f, indent=2, default=str)
-            
-            print(f"SESSION: Saved complete session to {filename}")
+            logger.info("SESSION: Saved session to %s (transcript: %s.jsonl)", filename, self.file_prefix)
             return filename
         except Exception as e:
-            print(f"SESSION: Save failed: {e}")
+            logger.warning("SESSION: Save failed: %s", e)
             return None
 
+# Whisper models are loaded once per process and shared by every AudioSystem.
+# int8 weights halve memory traffic against float16 and use the CPU's int8 dot-product
+# instructions; WHISPER_CPU_THREADS=0 lets CTranslate2 pick the thread count.
+WHISPER_COMPUTE_TYPE = os.getenv('WHISPER_COMPUTE_TYPE', 'int8')
+WHISPER_CPU_THREADS = int(os.getenv('WHISPER_CPU_THREADS', '4'))
+
+_whisper_models = {}
+_whisper_models_lock = threading.Lock()
+
+def load_whisper_model(name):
+    with _whisper_models_lock:
+        model = _whisper_models.get(name)
+        if model is None:
+            model = WhisperModel(
+                name, device="cpu", compute_type=WHISPER_COMPUTE_TYPE, cpu_threads=WHISPER_CPU_THREADS
+            )
+            _whisper_models[name] = model
+        return model
+
 # Audio System
 class AudioSystem:
     def __init__(self):
         self.enabled = AUDIO_AVAILABLE
         self.tts_enabled = False
         self.speech_enabled = False
+        self.piper = None
+        self.whisper = None
         
         if self.enabled:
             try:
                 print("Initializing audio...")
                 
-                try:
-                    self.recognizer = sr.Recognizer()
-                    self.microphone = sr.Microphone()
-                    with self.microphone as source:
-                        self.recognizer.adjust_for_ambient_noise(source, duration=1)
-                    
-                    self.recognizer.energy_threshold = 300
-                    self.recognizer.dynamic_energy_threshold = True
-                    self.recognizer.pause_threshold = 0.8
-                    self.speech_enabled = True
-                    print("Speech recognition ready")
-                except Exception as e:
-                    print(f"Speech recognition failed: {e}")
-                    self.speech_enabled = False
+                whisper_model = os.getenv('WHISPER_MODEL')
+                if whisper_model and WHISPER_AVAILABLE:
+                    try:
+                        self.whisper = load_whisper_model(whisper_model)
+                        self.vad = webrtcvad.Vad(2)
+                        # One worker: transcriptions run off the capture thread, one at a time
+                        self._asr_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix='asr')
+                        self.speech_enabled = True
+                        print("Local speech recognition ready")
+                    except Exception as e:
+                        print(f"Local speech recognition failed, using Google: {e}")
+                        self.whisper = None
+                
+                if self.whisper is None:
+                    try:
+                        self.recognizer = sr.Recognizer()
+                        self.microphone = sr.Microphone()
+                        with self.microphone as source:
+                            self.recognizer.adjust_for_ambient_noise(source, duration=1)
+                        
+                        self.recognizer.energy_threshold = 300
+                        self.recognizer.dynamic_energy_threshold = True
+                        self.recognizer.pause_threshold = 0.8
+                        self.speech_enabled = True
+                        print("Speech recognition ready")
+                    except Exception as e:
+                        print(f"Speech recognition failed: {e}")
+                        self.speech_enabled = False
+                
+                piper_voice = os.getenv('PIPER_VOICE')
+                if piper_voice and PIPER_AVAILABLE:
+                    try:
+                        self.piper = PiperVoice.load(piper_voice)
+                        self.piper_output = sd.RawOutputStream(
+                            samplerate=self.piper.config.sample_rate, channels=1, dtype='int16'
+                        )
+                        self.piper_output.start()
+                        self.tts_enabled = True
+                        print("Piper TTS ready")
+                    except Exception as e:
+                        print(f"Piper TTS init failed, using gTTS: {e}")
+                        self.piper = None
                 
-                try:
-                    pygame.mixer.pre_init(frequency=22050, size=-16, channels=2, buffer=1024)
-                    pygame.mixer.init()
-                    self.tts_enabled = True
-                    print("TTS system ready")
-                except Exception as e:
-                    print(f"TTS init failed: {e}")
-                    self.tts_enabled = False
+                if self.piper is None:
+                    try:
+                        pygame.mixer.pre_init(frequency=22050, size=-16, channels=1, buffer=1024)
+                        pygame.mixer.init()
+                        self.tts_enabled = True
+                        print("TTS system ready")
+                    except Exception as e:
+                        print(f"TTS init failed: {e}")
+                        self.tts_enabled = False
                     
             except Exception as e:
                 print(f"Audio init failed: {e}")
                 self.enabled = False
     
-    async def listen(self):
+    async def listen(self, on_partial=None):
+        """Return the next user utterance; with local ASR, on_partial(text) is called
+        on the event loop with the transcript at the first pause in speech, unless
+        speech resumed after that pause."""
         if not self.speech_enabled:
             return input("You: ").strip()
         
         print("Listening...")
         
+        loop = asyncio.get_event_loop()
+        if self.whisper is not None:
+            def _deliver(text, superseded):
+                # Speech may have resumed while the callback was waiting on the loop
+                if not superseded.is_set():
+                    on_partial(text)
+            
+            notify = (lambda text, superseded: loop.call_soon_threadsafe(_deliver, text, superseded)) if on_partial else None
+            return await loop.run_in_executor(None, self._listen_local, notify)
+        
         def _listen():
             try:
                 with self.microphone as source:
@@ -143,63 +380,219 @@ class AudioSystem:
             except Exception:
                 return "ERROR"
         
-        loop = asyncio.get_event_loop()
         return await loop.run_in_executor(None, _listen)
     
+    async def warm_up(self):
+        """Run Whisper once on silence, so the first real turn does not pay its startup cost"""
+        if self.whisper is None:
+            return
+        silence = bytes(ASR_FRAME * 2)
+        try:
+            await asyncio.get_event_loop().run_in_executor(None, self._transcribe, [silence] * 5)
+        except Exception as e:
+            print(f"Speech recognition warm-up failed: {e}")
+    
+    def _transcribe(self, frames):
+        audio = np.frombuffer(b"".join(frames), dtype=np.int16).astype(np.float32) / 32768.0
+        segments, _ = self.whisper.transcribe(
+            audio, language='en', beam_size=1, vad_filter=False, condition_on_previous_text=False
+        )
+        return "".join(segment.text for segment in segments).strip()
+    
+    def _transcribe_partial(self, frames, on_partial, superseded):
+        """Transcribe audio up to a pause and hand the text to the speculation callback, if any,
+        unless speech resumed after the pause"""
+        text = self._transcribe(frames)
+        if text and on_partial is not None and not superseded.is_set():
+            on_partial(text, superseded)
+        return text
+    
+    def _listen_local(self, on_partial=None):
+        """Record one phrase, ended by VAD-detected silence, and transcribe it with faster-whisper"""
+        try:
+            preroll = deque(maxlen=ASR_PREROLL_FRAMES)
+            frames = []
+            silent = 0
+            partial = None  # pending transcript of the current pause, if no speech followed it
+            superseded = None  # set once speech resumes after that pause
+            overflows = 0
+            
+            with sd.RawInputStream(samplerate=ASR_RATE, channels=1, dtype='int16', blocksize=ASR_FRAME) as stream:
+                for count in range(ASR_START_FRAMES + ASR_PHRASE_FRAMES):
+                    data, overflowed = stream.read(ASR_FRAME)
+                    if overflowed:
+                        overflows += 1
+                    frame = bytes(data)
+                    voiced = self.vad.is_speech(frame, ASR_RATE)
+                    
+                    if not frames:
+                        if not voiced:
+                            if count >= ASR_START_FRAMES:
+                                return "TIMEOUT"
+                            preroll.append(frame)
+                            continue
+                        frames.extend(preroll)
+                    
+                    frames.append(frame)
+                    if voiced:
+                        silent = 0
+                        if partial is not None:
+                            # Drop the stale pause job so the next pause does not queue behind it
+                            partial.cancel()
+                            superseded.set()
+                            partial = None
+                    else:
+                        silent += 1
+                    
+                    # Transcribe the pause on the ASR thread while capture continues, so
+                    # the result is ready the moment the silence confirms the phrase is
+                    # over, and reading never falls behind the device
+                    if silent == ASR_PAUSE_FRAMES:
+                        superseded = threading.Event()
+                        partial = self._asr_pool.submit(self._transcribe_partial, list(frames), on_partial, superseded)
+                    
+                    if silent >= ASR_SILENCE_FRAMES or len(frames) >= ASR_PHRASE_FRAMES:
+                        break
+            
+            if overflows:
+                logger.warning("AUDIO: Input overflowed on %s frames; transcript may have gaps", overflows)
+            
+            if not frames:
+                return "TIMEOUT"
+            
+            # Only silence followed the pause, so its transcript is final
+            if partial is None:
+                partial = self._asr_pool.submit(self._transcribe, frames)
+            result = partial.result()
+            if not result:
+                return "UNCLEAR"
+            print(f"Recognized: '{result}'")
+            return result
+        except Exception:
+            return "ERROR"
+    
+    def _synthesize(self, text):
+        """Render text to MP3 in memory with gTTS"""
+        audio = io.BytesIO()
+        gTTS(text=text, lang='en', slow=False).write_to_fp(audio)
+        audio.seek(0)
+        return audio
+    
+    def _play(self, audio):
+        """Play rendered MP3 audio to the end"""
+        pygame.mixer.music.load(audio, 'mp3')
+        pygame.mixer.music.play()
+        
+        # Polls in the executor thread, not on the event loop; the music end event
+        # would need pygame's video subsystem, which a console agent does not start
+        max_wait = 30
+        wait_count = 0
+        while pygame.mixer.music.get_busy() and wait_count < max_wait * 20:
+            pygame.time.wait(50)
+            wait_count += 1
+        
+        if pygame.mixer.music.get_busy():
+            pygame.mixer.music.stop()
+    
+    async def _play_rendered(self, rendered):
+        """Wait for a synthesis future and play the result"""
+        try:
+            loop = asyncio.get_event_loop()
+            audio = await asyncio.wait_for(rendered, timeout=35)
+            if not self.tts_enabled:
+                return
+            await asyncio.wait_for(
+                loop.run_in_executor(None, self._play, audio), 
+                timeout=35
+            )
+        except asyncio.TimeoutError:
+            print("TTS timeout - disabling TTS")
+            self.tts_enabled = False
+        except Exception as e:
+            print(f"TTS error: {e}")
+            self.tts_enabled = False
+    
+    async def _speak_local(self, text):
+        """Write Piper audio to the output stream as it is synthesized"""
+        def _speak():
+            for chunk in self.piper.synthesize_stream_raw(text):
+                self.piper_output.write(chunk)
+        
+        try:
+            loop = asyncio.get_event_loop()
+            await asyncio.wait_for(loop.run_in_executor(None, _speak), timeout=35)
+        except asyncio.TimeoutError:
+            print("TTS timeout - disabling TTS")
+            self.tts_enabled = False
+        except Exception as e:
+            print(f"TTS error: {e}")
+            self.tts_enabled = False
+    
     async def speak(self, text):
+        if self.tts_enabled and self.piper is None:
+            sentences = _SENTENCE_BREAK.split(text.strip())
+            if len(sentences) > 1:
+                # gTTS renders a whole text before any of it plays; start playing the
+                # first sentence while the rest are synthesized
+                pending = asyncio.Queue()
+                for sentence in sentences:
+                    pending.put_nowait(sentence)
+                pending.put_nowait(None)
+                await self.speak_stream(pending)
+                return
+        
         print(f"Agent: {text}")
         
         if not self.tts_enabled:
             return
         
-        def _speak():
-            try:
-                tts = gTTS(text=text, lang='en', slow=False)
-                
-                with tempfile.NamedTemporaryFile(suffix='.mp3', delete=False) as tmp:
-                    temp_file = tmp.name
-                
-                try:
-                    tts.save(temp_file)
-                    pygame.mixer.music.load(temp_file)
-                    pygame.mixer.music.play()
-                    
-                    max_wait = 30
-                    wait_count = 0
-                    while pygame.mixer.music.get_busy() and wait_count < max_wait * 20:
-                        pygame.time.wait(50)
-                        wait_count += 1
-                    
-                    if pygame.mixer.music.get_busy():
-                        pygame.mixer.music.stop()
-                        
-                finally:
-                    try:
-                        os.unlink(temp_file)
-                    except:
-                        pass
-                        
-            except Exception as e:
-                print(f"TTS error: {e}")
-                self.tts_enabled = False
+        if self.piper is not None:
+            await self._speak_local(text)
+            return
         
-        if self.tts_enabled:
-            try:
-                loop = asyncio.get_event_loop()
-                await asyncio.wait_for(
-                    loop.run_in_executor(None, _speak), 
-                    timeout=35
-                )
-            except asyncio.TimeoutError:
-                print("TTS timeout - disabling TTS")
-                self.tts_enabled = False
-            except Exception:
-                self.tts_enabled = False
+        loop = asyncio.get_event_loop()
+        await self._play_rendered(loop.run_in_executor(None, self._synthesize, text))
+    
+    async def speak_stream(self, sentences):
+        """Speak sentences from a queue until None; returns whether anything was spoken.
+        
+        Each sentence is synthesized while the one before it is playing, so
+        playback does not stop for a gTTS round trip between sentences.
+        """
+        loop = asyncio.get_event_loop()
+        rendered = asyncio.Queue(maxsize=2)
+        
+        async def render():
+            while (sentence := await sentences.get()) is not None:
+                # Piper streams its own audio; only gTTS needs rendering ahead
+                if self.tts_enabled and self.piper is None:
+                    synthesis = loop.run_in_executor(None, self._synthesize, sentence)
+                else:
+                    synthesis = None
+                await rendered.put((sentence, synthesis))
+            await rendered.put(None)
+        
+        renderer = asyncio.create_task(render())
+        spoken = False
+        while (item := await rendered.get()) is not None:
+            sentence, synthesis = item
+            print(f"Agent: {sentence}")
+            spoken = True
+            if synthesis is not None:
+                await self._play_rendered(synthesis)
+            elif self.tts_enabled and self.piper is not None:
+                await self._speak_local(sentence)
+        await renderer
+        return spoken
+
+def _json_response(obj, status=200):
+    """Serialize a response body with orjson, which emits UTF-8 bytes directly"""
+    return Response(orjson.dumps(obj), status=status, mimetype='application/json')
 
 # A2A Message
 class A2AMessage:
     def __init__(self, msg_type, agent_id, content, msg_id=None):
-        self.id = msg_id or str(uuid.uuid4())
+        self.id = msg_id or secrets.token_hex(16)
         self.type = msg_type
         self.agent_id = agent_id
         self.content = content
@@ -217,6 +610,11 @@ class A2AMessage:
         return cls(data["type"], data["agent_id"], data["content"], data["id"])
 
 # A2A Triage Service
+# The shared token is renewed this many seconds before it expires (it stops being used
+# 60s before); failed fetches are retried after TOKEN_RETRY_DELAY
+TOKEN_REFRESH_AHEAD = 120
+TOKEN_RETRY_DELAY = 30
+
 class A2ATriageService:
     def __init__(self):
         self.app = Flask(__name__)
@@ -227,28 +625,50 @@ class A2ATriageService:
         self.instance_id = os.getenv('TRIAGE_INSTANCE_ID')
         self.token_url = os.getenv('TRIAGE_TOKEN_URL')
         self.base_url = os.getenv('TRIAGE_BASE_URL')
+        self.http = create_http_session()
+        _register_local_service(self)
+        
+        # One client-credentials token is shared by all sessions until shortly before it expires
+        self._token = None
+        self._token_expires = 0
+        self._token_lock = threading.Lock()
+        
+        # A2A message type -> handler
+        self.handlers = {
+            "triage_start": self._start_triage,
+            "triage_message": self._handle_message,
+            "triage_summary": self._get_summary
+        }
         
         @self.app.route('/a2a/message', methods=['POST'])
         def handle_message():
             try:
-                message = A2AMessage.from_dict(request.json)
-                print(f"A2A-SERVICE: Received {message.type}")
+                message = A2AMessage.from_dict(orjson.loads(request.get_data()))
+                logger.debug("A2A-SERVICE: Received %s", message.type)
+                
+                handler = self.handlers.get(message.type)
+                if handler is None:
+                    return _json_response({"error": "Unknown type"}, 400)
+                return _json_response(handler(message).to_dict())
                 
-                if message.type == "triage_start":
-                    return jsonify(self._start_triage(message).to_dict())
-                elif message.type == "triage_message":
-                    return jsonify(self._handle_message(message).to_dict())
-                elif message.type == "triage_summary":
-                    return jsonify(self._get_summary(message).to_dict())
-                else:
-                    return jsonify({"error": "Unknown type"}), 400
-                    
             except Exception as e:
-                print(f"A2A-SERVICE: Error: {e}")
-                return jsonify({"error": str(e)}), 500
+                logger.warning("A2A-SERVICE: Error: %s", e)
+                return _json_response({"error": str(e)}, 500)
+    
+    def _token_valid(self):
+        return self._token is not None and time.monotonic() < self._token_expires - 60
     
     def _get_token(self):
-        print("A2A-SERVICE: Getting token...")
+        if self._token_valid():
+            return self._token
+        
+        with self._token_lock:
+            if self._token_valid():
+                return self._token
+            return self._fetch_token()
+    
+    def _fetch_token(self):
+        logger.info("A2A-SERVICE: Getting token...")
         creds = base64.b64encode(f"{self.app_id}:{self.app_key}".encode()).decode()
         headers = {
             "Content-Type": "application/json",
@@ -257,64 +677,68 @@ class A2ATriageService:
         }
         payload = {"grant_type": "client_credentials"}
         
-        response = requests.post(self.token_url, headers=headers, json=payload, timeout=30)
-        print(f"A2A-SERVICE: Token response: {response.status_code}")
+        response = self.http.post(self.token_url, headers=headers, data=orjson.dumps(payload), timeout=30)
+        logger.debug("A2A-SERVICE: Token response: %s", response.status_code)
         
         if response.status_code == 200:
-            token = response.json()['access_token']
-            print(f"A2A-SERVICE: Token received: {token[:20]}...")
+            data = orjson.loads(response.content)
+            token = data['access_token']
+            self._token = token
+            self._token_expires = time.monotonic() + int(data.get('expires_in', 3600))
+            logger.info("A2A-SERVICE: Token received: %s...", token[:20])
             return token
         
-        print(f"A2A-SERVICE: Token failed: {response.text}")
+        logger.warning("A2A-SERVICE: Token failed: %s", response.text)
         raise Exception(f"Token failed: {response.status_code}")
     
     def _create_survey(self, token, age, sex):
-        print(f"A2A-SERVICE: Creating survey - {age}yo {sex}")
+        logger.info("A2A-SERVICE: Creating survey - %syo %s", age, sex)
         headers = {"Authorization": f"Bearer {token}", "Content-Type": "application/json"}
         payload = {"sex": sex.lower(), "age": {"value": age, "unit": "year"}}
         
-        response = requests.post(f"{self.base_url}/surveys", headers=headers, json=payload, timeout=30)
-        print(f"A2A-SERVICE: Survey response: {response.status_code}")
+        response = self.http.post(f"{self.base_url}/surveys", headers=headers, data=orjson.dumps(payload), timeout=30)
+        logger.debug("A2A-SERVICE: Survey response: %s", response.status_code)
         
         if response.status_code == 200:
-            survey_id = response.json()['survey_id']
-            print(f"A2A-SERVICE: Survey created: {survey_id}")
+            survey_id = orjson.loads(response.content)['survey_id']
+            logger.info("A2A-SERVICE: Survey created: %s", survey_id)
             return survey_id
         
-        print(f"A2A-SERVICE: Survey failed: {response.text}")
+        logger.warning("A2A-SERVICE: Survey failed: %s", response.text)
         raise Exception(f"Survey failed: {response.status_code}")
     
     def _send_message(self, token, survey_id, message):
-        print(f"A2A-SERVICE: Sending message: '{message[:50]}...'")
+        logger.debug("A2A-SERVICE: Sending message: '%s...'", message[:50])
         headers = {"Authorization": f"Bearer {token}", "Content-Type": "application/json"}
         payload = {"user_message": message}
         
-        response = requests.post(f"{self.base_url}/surveys/{survey_id}/messages", headers=headers, json=payload, timeout=30)
-        print(f"A2A-SERVICE: Message response: {response.status_code}")
+        response = self.http.post(f"{self.base_url}/surveys/{survey_id}/messages", headers=headers, data=orjson.dumps(payload), timeout=30)
+        logger.debug("A2A-SERVICE: Message response: %s", response.status_code)
         
         if response.status_code == 200:
-            data = response.json()
+            data = orjson.loads(response.content)
             result = {
                 "success": True,
                 "response": data.get('assistant_message', ''),
                 "state": data.get('survey_state', 'active')
             }
-            print(f"A2A-SERVICE: State: {result['state']}")
+            logger.info("A2A-SERVICE: State: %s", result['state'])
             return result
         
-        print(f"A2A-SERVICE: Message failed: {response.text}")
+        logger.warning("A2A-SERVICE: Message failed: %s", response.text)
         return {"success": False, "response": "Technical issue."}
     
     def _get_survey_summary(self, token, survey_id):
-        print("A2A-SERVICE: Getting summary...")
+        logger.info("A2A-SERVICE: Getting summary...")
         headers = {"Authorization": f"Bearer {token}"}
-        response = requests.get(f"{self.base_url}/surveys/{survey_id}/summary", headers=headers, timeout=30)
+        response = self.http.get(f"{self.base_url}/surveys/{survey_id}/summary", headers=headers, timeout=30)
         
-        print(f"A2A-SERVICE: Summary response: {response.status_code}")
+        logger.debug("A2A-SERVICE: Summary response: %s", response.status_code)
         
         if response.status_code == 200:
-            data = response.json()
-            print(f"A2A-SERVICE: Summary data: {json.dumps(data, indent=2)}")
+            data = orjson.loads(response.content)
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("A2A-SERVICE: Summary data: %s", orjson.dumps(data, option=orjson.OPT_INDENT_2).decode())
             
             urgency = "low"
             doctor = "general practitioner"
@@ -339,10 +763,10 @@ class A2ATriageService:
                 "doctor_type": doctor,
                 "notes": str(data.get('notes', ''))
             }
-            print(f"A2A-SERVICE: Final summary: {result}")
+            logger.debug("A2A-SERVICE: Final summary: %s", result)
             return result
         
-        print(f"A2A-SERVICE: Summary failed: {response.text}")
+        logger.warning("A2A-SERVICE: Summary failed: %s", response.text)
         return {"success": False}
     
     def _start_triage(self, message):
@@ -356,7 +780,6 @@ class A2ATriageService:
             survey_id = self._create_survey(token, age, sex)
             
             self.sessions[message.agent_id] = {
-                "token": token,
                 "survey_id": survey_id,
                 "state": "active"
             }
@@ -370,7 +793,7 @@ class A2ATriageService:
                 "survey_id": survey_id
             })
         except Exception as e:
-            print(f"A2A-SERVICE: Start error: {e}")
+            logger.warning("A2A-SERVICE: Start error: %s", e)
             return A2AMessage("triage_response", "triage_service", {
                 "success": False,
                 "error": str(e)
@@ -389,11 +812,11 @@ class A2ATriageService:
         session = self.sessions[agent_id]
         
         try:
-            result = self._send_message(session["token"], session["survey_id"], user_message)
+            result = self._send_message(self._get_token(), session["survey_id"], user_message)
             session["state"] = result.get("state", "active")
             return A2AMessage("triage_response", "triage_service", result)
         except Exception as e:
-            print(f"A2A-SERVICE: Message error: {e}")
+            logger.warning("A2A-SERVICE: Message error: %s", e)
             return A2AMessage("triage_response", "triage_service", {
                 "success": False,
                 "error": str(e)
@@ -411,36 +834,112 @@ class A2ATriageService:
         session = self.sessions[agent_id]
         
         try:
-            summary = self._get_survey_summary(session["token"], session["survey_id"])
+            summary = self._get_survey_summary(self._get_token(), session["survey_id"])
             del self.sessions[agent_id]
             return A2AMessage("triage_summary_response", "triage_service", summary)
         except Exception as e:
-            print(f"A2A-SERVICE: Summary error: {e}")
+            logger.warning("A2A-SERVICE: Summary error: %s", e)
             return A2AMessage("triage_summary_response", "triage_service", {
                 "success": False,
                 "error": str(e)
             })
     
+    def _refresh_token_loop(self):
+        """Fetch the token up front and renew it ahead of expiry, so triage calls never wait on it"""
+        while True:
+            try:
+                with self._token_lock:
+                    self._fetch_token()
+                delay = self._token_expires - time.monotonic() - TOKEN_REFRESH_AHEAD
+            except Exception as e:
+                logger.warning("A2A-SERVICE: Token refresh failed: %s", e)
+                delay = TOKEN_RETRY_DELAY
+            time.sleep(max(delay, TOKEN_RETRY_DELAY))
+    
+    def start_token_refresh(self):
+        threading.Thread(target=self._refresh_token_loop, daemon=True).start()
+    
     def run(self):
         print("A2A Triage Service starting on localhost:8887")
-        self.app.run(host='localhost', port=8887, debug=False, use_reloader=False)
+        # Fetch the token before the first caller needs it
+        self.start_token_refresh()
+        
+        if _gevent_patched():
+            from gevent.pywsgi import WSGIServer
+            logger.info("A2A-SERVICE: Serving with gevent WSGIServer")
+            WSGIServer(('localhost', 8887), self.app, log=None).serve_forever()
+            return
+        
+        self.app.run(host='localhost', port=8887, debug=False, use_reloader=False, threaded=True)
+
+# Triage states that end the interview
+_TERMINAL_STATES = frozenset({"completed", "finished", "done"})
+
+# Triage service constructed in this process, if any
+_local_service = None
+
+def _register_local_service(service):
+    global _local_service
+    _local_service = service
+
+class InProcessA2ATransport:
+    """Hands A2A messages straight to a triage service in this process"""
+    
+    def __init__(self, service):
+        self.service = service
+    
+    async def send(self, message):
+        handler = self.service.handlers.get(message.type)
+        if handler is None:
+            raise Exception(f"A2A request failed: unknown type {message.type}")
+        # Handlers block on the triage API, so keep them off the event loop
+        return await asyncio.to_thread(handler, message)
+
+def _gevent_patched():
+    """Check whether the socket module has been monkey-patched by gevent"""
+    try:
+        from gevent import monkey
+    except ImportError:
+        return False
+    return monkey.is_module_patched('socket')
 
 # A2A Client
 class A2AClient:
-    def __init__(self):
+    def __init__(self, http=None):
         self.base_url = "http://localhost:8887"
-        self.agent_id = f"agent_{uuid.uuid4().hex[:8]}"
-        print(f"A2A-CLIENT: Initialized")
+        self.agent_id = f"agent_{secrets.token_hex(4)}"
+        
+        # Skip HTTP and JSON entirely when the service lives in this process
+        self.transport = InProcessA2ATransport(_local_service) if _local_service else None
+        self._owns_http = http is None and self.transport is None
+        self.http = create_async_http_client() if self._owns_http else http
+        logger.info("A2A-CLIENT: Initialized (%s)", 'in-process' if self.transport else 'HTTP')
+    
+    async def close(self):
+        if self._owns_http:
+            await self.http.aclose()
+    
+    async def warm_up(self):
+        """Open the keep-alive connection to the triage service ahead of triage"""
+        if self.transport:
+            return
+        try:
+            await self.http.head(f"{self.base_url}/a2a/message", timeout=5)
+        except httpx.HTTPError:
+            pass
     
     async def send_message(self, message):
-        def _request():
-            return requests.post(f"{self.base_url}/a2a/message", json=message.to_dict(), timeout=30)
+        if self.transport:
+            return await self.transport.send(message)
         
-        loop = asyncio.get_event_loop()
-        response = await loop.run_in_executor(None, _request)
+        response = await self.http.post(
+            f"{self.base_url}/a2a/message",
+            headers={"Content-Type": "application/json"},
+            content=orjson.dumps(message.to_dict())
+        )
         
         if response.status_code == 200:
-            return A2AMessage.from_dict(response.json())
+            return A2AMessage.from_dict(orjson.loads(response.content))
         raise Exception(f"A2A request failed: {response.status_code}")
     
     async def start_triage(self, age, sex, complaint):
@@ -462,25 +961,103 @@ class A2AClient:
         response = await self.send_message(message)
         return response.content
 
-# LLM Client
-class LLMClient:
-    def __init__(self, jwt_token, endpoint_url, project_id, connection_id):
-        self.headers = {
-            'Content-Type': 'application/json',
-            'Authorization': f'Bearer {jwt_token}'
-        }
-        self.endpoint_url = endpoint_url
-        self.project_id = project_id
-        self.connection_id = connection_id
-        print("LLM: Initialized with JWT endpoint")
+# LLM streaming
+_RESPONSE_FIELD = re.compile(r'"response"\s*:\s*"')
+_NO_TRIAGE = re.compile(r'"need_triage"\s*:\s*false')
+_NO_ELIGIBILITY = re.compile(r'"call_eligibility"\s*:\s*false')
+_SENTENCE_BREAK = re.compile(r'(?<=[.!?])\s+')
+_JSON_ESCAPES = {'n': '\n', 't': '\t', 'r': '\r', 'b': '\b', 'f': '\f'}
+
+def _unicode_escape(buf, i):
+    """Decode the \\uXXXX escape at buf[i], joining a UTF-16 surrogate pair.
     
-    async def process(self, user_input, session):
-        print(f"LLM: Processing: '{user_input[:50]}...'")
+    Returns (char, length), or None when more input is needed to finish it. A
+    lone surrogate becomes U+FFFD, since it cannot be printed or spoken; a
+    malformed escape raises ValueError.
+    """
+    n = len(buf)
+    if i + 6 > n:
+        return None
+    code = int(buf[i + 2:i + 6], 16)
+    if not 0xD800 <= code < 0xE000:
+        return chr(code), 6
+    if code >= 0xDC00 or (i + 6 < n and buf[i + 6] != '\\'):
+        return '\ufffd', 6
+    # High surrogate: its low half may still be on the way
+    if i + 12 > n:
+        return None
+    low = int(buf[i + 8:i + 12], 16) if buf[i + 7] == 'u' else 0
+    if not 0xDC00 <= low < 0xE000:
+        return '\ufffd', 6
+    return chr(0x10000 + ((code - 0xD800) << 10) + (low - 0xDC00)), 12
+
+class ResponseStreamer:
+    """Pulls the "response" string out of a streamed JSON completion, one sentence at a time.
+    
+    Only streams when the fields before "response" rule out triage and eligibility,
+    since the agent speaks other messages ahead of the response in those turns.
+    """
+    def __init__(self):
+        self.buffer = ""
+        self.pos = None
+        self.pending = []
+        self.enabled = True
+        self.done = False
+    
+    def feed(self, delta):
+        self.buffer += delta
+        if self.done or not self.enabled:
+            return []
+        
+        if self.pos is None:
+            match = _RESPONSE_FIELD.search(self.buffer)
+            if not match:
+                return []
+            prefix = self.buffer[:match.start()]
+            if not (_NO_TRIAGE.search(prefix) and _NO_ELIGIBILITY.search(prefix)):
+                self.enabled = False
+                return []
+            self.pos = match.end()
+        
+        buf, i, n = self.buffer, self.pos, len(self.buffer)
+        while i < n:
+            ch = buf[i]
+            if ch == '\\':
+                if i + 1 >= n:
+                    break
+                if buf[i + 1] == 'u':
+                    try:
+                        escape = _unicode_escape(buf, i)
+                    except ValueError:
+                        # Not valid JSON; leave the reply to the final parse
+                        self.enabled = False
+                        return []
+                    if escape is None:
+                        break
+                    self.pending.append(escape[0])
+                    i += escape[1]
+                else:
+                    self.pending.append(_JSON_ESCAPES.get(buf[i + 1], buf[i + 1]))
+                    i += 2
+                continue
+            if ch == '"':
+                self.done = True
+                break
+            self.pending.append(ch)
+            i += 1
+        self.pos = i
         
-        prompt = f"""You are a healthcare appointment scheduler.
+        parts = _SENTENCE_BREAK.split("".join(self.pending))
+        if self.done:
+            self.pending = []
+        else:
+            self.pending = [parts.pop()]
+        return [p.strip() for p in parts if p.strip()]
 
-Current session data: {json.dumps(session.data)}
-User input: "{user_input}"
+# LLM Client
+# The system prompt is byte-identical on every call so the endpoint can reuse its cached
+# prefill; the per-turn session data and user input go in the user message after it
+_SCHEDULER_PROMPT = """You are a healthcare appointment scheduler.
 
 EXTRACTION RULES:
 - For date of birth: Extract MM/DD/YYYY as "date_of_birth"
@@ -498,65 +1075,166 @@ Flow:
 4. Get provider → call eligibility → announce [Payer name, Policy ID, Co-pay details]
 5. Schedule appointment - don't check availability, provide confirmation code, end call
 
-JSON response:
-{{
-    "response": "what to say",
-    "extract": {{"field": "value"}},
+JSON response, with "response" as the last field:
+{
+    "extract": {"field": "value"},
     "need_triage": true/false,
     "call_discovery": true/false,
     "call_eligibility": true/false,
-    "done": true/false
-}}"""
+    "done": true/false,
+    "response": "what to say"
+}"""
+
+# Reply used when the LLM call fails or its answer is not a JSON object
+_FALLBACK_RESULT = {
+    "response": "I understand. Please continue.",
+    "extract": {},
+    "need_triage": False,
+    "call_discovery": False,
+    "call_eligibility": False,
+    "done": False
+}
+
+# Markdown fence the model sometimes wraps its JSON answer in
+_CODE_FENCE = re.compile(r'^\s*```(?:json)?|```\s*$')
+
+class LLMClient:
+    def __init__(self, jwt_token, endpoint_url, project_id, connection_id, http=None):
+        self.headers = {
+            'Content-Type': 'application/json',
+            'Authorization': f'Bearer {jwt_token}'
+        }
+        self.endpoint_url = endpoint_url
+        self.project_id = project_id
+        self.connection_id = connection_id
+        self._owns_http = http is None
+        self.http = http or create_async_http_client()
+        logger.info("LLM: Initialized with JWT endpoint")
+    
+    async def close(self):
+        if self._owns_http:
+            await self.http.aclose()
+    
+    async def warm_up(self):
+        """Open the keep-alive connection ahead of the first real call"""
+        try:
+            await self.http.head(self.endpoint_url, timeout=5)
+        except httpx.HTTPError:
+            pass
+    
+    def _log_usage(self, usage):
+        """Report how much of the prompt the endpoint served from its prefix cache"""
+        if not usage:
+            return
+        cached = (usage.get('prompt_tokens_details') or {}).get('cached_tokens', 0)
+        logger.debug("LLM: Prompt tokens %s, cached %s", usage.get('prompt_tokens'), cached)
+    
+    async def _read_completion(self, response, streamer, sentences):
+        """Collect the completion text from an SSE stream, feeding response sentences to the queue"""
+        # Endpoints without streaming support answer with a single JSON body
+        if not response.headers.get('Content-Type', '').startswith('text/event-stream'):
+            data = orjson.loads(await response.aread())
+            self._log_usage(data.get('usage'))
+            if 'choices' in data and data['choices']:
+                return data['choices'][0]['message']['content']
+            return None
+        
+        content = []
+        async for line in response.aiter_lines():
+            if not line or not line.startswith('data:'):
+                continue
+            chunk = line[5:].strip()
+            if chunk == '[DONE]':
+                break
+            data = orjson.loads(chunk)
+            self._log_usage(data.get('usage'))
+            choices = data.get('choices')
+            delta = choices[0].get('delta', {}).get('content') if choices else None
+            if not delta:
+                continue
+            content.append(delta)
+            if sentences is not None:
+                for sentence in streamer.feed(delta):
+                    sentences.put_nowait(sentence)
+        return "".join(content)
+    
+    async def process(self, user_input, session, sentences=None):
+        """Ask the LLM for the next turn; if sentences (an asyncio.Queue) is given,
+        sentences of the response are put on it as they stream in, then None."""
+        logger.info("LLM: Processing: '%s...'", user_input[:50])
+        
+        turn = f'Current session data: {orjson.dumps(session.data).decode()}\nUser input: "{user_input}"'
         
         payload = {
             "messages": [
-                {"role": "system", "content": prompt},
-                {"role": "user", "content": user_input}
+                {"role": "system", "content": _SCHEDULER_PROMPT},
+                {"role": "user", "content": turn}
             ],
             "project_id": self.project_id,
             "connection_id": self.connection_id,
             "max_tokens": 400,
-            "temperature": 0.2
+            "temperature": 0.2,
+            "stream": True
         }
         
-        def _request():
-            return requests.post(self.endpoint_url, headers=self.headers, json=payload, timeout=30)
+        streamer = ResponseStreamer()
+        content = None
         
-        loop = asyncio.get_event_loop()
-        response = await loop.run_in_executor(None, _request)
-        
-        if response.status_code == 200:
-            data = response.json()
-            if 'choices' in data and data['choices']:
-                content = data['choices'][0]['message']['content']
-                
-                try:
-                    if content.startswith('```json'):
-                        content = content[7:]
-                    if content.endswith('```'):
-                        content = content[:-3]
-                    
-                    result = json.loads(content.strip())
-                    print("LLM: Response parsed")
-                    return result
-                except:
-                    pass
-        
-        return {
-            "response": "I understand. Please continue.",
-            "extract": {},
-            "need_triage": False,
-            "call_discovery": False,
-            "call_eligibility": False,
-            "done": False
-        }
+        try:
+            async with self.http.stream("POST", self.endpoint_url, headers=self.headers, content=orjson.dumps(payload)) as response:
+                if response.status_code == 200:
+                    content = await self._read_completion(response, streamer, sentences)
+        except (httpx.HTTPError, orjson.JSONDecodeError, KeyError, IndexError, TypeError) as e:
+            logger.warning("LLM: Request failed: %s", e)
+        finally:
+            if sentences is not None:
+                sentences.put_nowait(None)
+        
+        if content:
+            try:
+                result = orjson.loads(_CODE_FENCE.sub('', content).strip())
+            except orjson.JSONDecodeError:
+                result = None
+            if isinstance(result, dict):
+                logger.info("LLM: Response parsed")
+                return result
+        
+        return _FALLBACK_RESULT
+
+# Insurance response parsing
+_DOB_US = re.compile(r'^\d{1,2}/\d{1,2}/\d{4}$')
+_DOB_ISO = re.compile(r'^\d{4}-\d{1,2}-\d{1,2}$')
+# Payer and member ID in one match over the original text. Each lookahead tries its first
+# label anywhere before falling back to the second, so "payer" wins over an earlier "insurance"
+_DISCOVERY_FIELDS = re.compile(
+    r'(?:(?=.*?payer[:\s]*(?P<payer>[^\n,;]+))|(?=.*?insurance[:\s]*(?P<insurance>[^\n,;]+))|)'
+    r'(?:(?=.*?member\s*id[:\s]*(?P<member_id>[a-z0-9\-]+))|(?=.*?policy[:\s]*(?P<policy>[a-z0-9\-]+))|)',
+    re.IGNORECASE | re.DOTALL
+)
+_COPAY = re.compile(r'co-?pay[:\s]*\$?([0-9,]+)')
+_PROVIDER_TITLES = re.compile(r'\b(Dr\.?|MD|DO)\b', re.IGNORECASE)
 
 # Insurance Client
 class InsuranceClient:
-    def __init__(self, mcp_url, api_key):
+    TIMEOUT = 45
+    
+    def __init__(self, mcp_url, api_key, http=None):
         self.mcp_url = mcp_url
         self.headers = {"Content-Type": "application/json", "X-INF-API-KEY": api_key}
-        print("INSURANCE: Client initialized")
+        self._owns_http = http is None
+        self.http = http or create_async_http_client(timeout=self.TIMEOUT)
+        logger.info("INSURANCE: Client initialized")
+    
+    async def close(self):
+        if self._owns_http:
+            await self.http.aclose()
+    
+    async def warm_up(self):
+        """Open the keep-alive connection ahead of the first real call"""
+        try:
+            await self.http.head(self.mcp_url, timeout=5)
+        except httpx.HTTPError:
+            pass
     
     def _split_name(self, name):
         parts = name.strip().split()
@@ -571,21 +1249,21 @@ class InsuranceClient:
         if not dob:
             return ""
         
-        print(f"INSURANCE: Formatting DOB '{dob}'")
+        logger.debug("INSURANCE: Formatting DOB '%s'", dob)
         
-        if re.match(r'^\d{1,2}/\d{1,2}/\d{4}$', dob):
+        if _DOB_US.match(dob):
             month, day, year = dob.split('/')
             formatted = f"{year}-{month.zfill(2)}-{day.zfill(2)}"
-            print(f"INSURANCE: Converted to '{formatted}'")
+            logger.debug("INSURANCE: Converted to '%s'", formatted)
             return formatted
         
-        if re.match(r'^\d{4}-\d{1,2}-\d{1,2}$', dob):
+        if _DOB_ISO.match(dob):
             return dob
         
         return dob
     
     async def discovery(self, name, dob, state):
-        print(f"INSURANCE: Discovery - {name}, {dob}, {state}")
+        logger.info("INSURANCE: Discovery - %s, %s, %s", name, dob, state)
         first, last = self._split_name(name)
         formatted_dob = self._format_dob(dob)
         formatted_state = state.strip().title() if state else ""
@@ -605,48 +1283,34 @@ class InsuranceClient:
             }
         }
         
-        print(f"INSURANCE: Discovery payload: {json.dumps(payload, indent=2)}")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("INSURANCE: Discovery payload: %s", orjson.dumps(payload, option=orjson.OPT_INDENT_2).decode())
         
-        def _request():
-            return requests.post(self.mcp_url, headers=self.headers, json=payload, timeout=45)
-        
-        loop = asyncio.get_event_loop()
-        response = await loop.run_in_executor(None, _request)
+        response = await self.http.post(self.mcp_url, headers=self.headers, content=orjson.dumps(payload), timeout=self.TIMEOUT)
         
-        print(f"INSURANCE: Discovery response: {response.status_code}")
+        logger.debug("INSURANCE: Discovery response: %s", response.status_code)
         
         if response.status_code == 200:
-            data = response.json()
+            data = orjson.loads(response.content)
             if "result" in data:
                 result_text = str(data["result"])
                 
-                payer = ""
-                member_id = ""
+                fields = _DISCOVERY_FIELDS.match(result_text)
+                payer = (fields['payer'] or fields['insurance'] or "").strip().title()
+                member_id = (fields['member_id'] or fields['policy'] or "").strip().upper()
                 
-                for pattern in [r'payer[:\s]*([^\n,;]+)', r'insurance[:\s]*([^\n,;]+)']:
-                    match = re.search(pattern, result_text.lower())
-                    if match:
-                        payer = match.group(1).strip().title()
-                        break
-                
-                for pattern in [r'member\s*id[:\s]*([a-za-z0-9\-]+)', r'policy[:\s]*([a-za-z0-9\-]+)']:
-                    match = re.search(pattern, result_text.lower())
-                    if match:
-                        member_id = match.group(1).strip().upper()
-                        break
-                
-                print(f"INSURANCE: Found - Payer: {payer}, Member: {member_id}")
+                logger.info("INSURANCE: Found - Payer: %s, Member: %s", payer, member_id)
                 return {"success": True, "payer": payer, "member_id": member_id}
         
-        print("INSURANCE: Discovery failed")
+        logger.warning("INSURANCE: Discovery failed")
         return {"success": False}
     
     async def eligibility(self, name, dob, subscriber_id, payer_name, provider_name):
-        print(f"INSURANCE: Eligibility check")
+        logger.info("INSURANCE: Eligibility check")
         first, last = self._split_name(name)
         formatted_dob = self._format_dob(dob)
         
-        provider_clean = re.sub(r'\b(Dr\.?|MD|DO)\b', '', provider_name, flags=re.IGNORECASE).strip()
+        provider_clean = _PROVIDER_TITLES.sub('', provider_name).strip()
         provider_first, provider_last = self._split_name(provider_clean)
         
         payload = {
@@ -668,27 +1332,160 @@ class InsuranceClient:
             }
         }
         
-        def _request():
-            return requests.post(self.mcp_url, headers=self.headers, json=payload, timeout=45)
-        
-        loop = asyncio.get_event_loop()
-        response = await loop.run_in_executor(None, _request)
+        response = await self.http.post(self.mcp_url, headers=self.headers, content=orjson.dumps(payload), timeout=self.TIMEOUT)
         
         if response.status_code == 200:
-            data = response.json()
+            data = orjson.loads(response.content)
             if "result" in data:
                 result_text = str(data["result"])
                 
                 copay = ""
-                copay_match = re.search(r'co-?pay[:\s]*\$?([0-9,]+)', result_text.lower())
+                copay_match = _COPAY.search(result_text.lower())
                 if copay_match:
                     copay = copay_match.group(1)
                 
-                print(f"INSURANCE: Eligibility - Copay: ${copay}")
+                logger.info("INSURANCE: Eligibility - Copay: $%s", copay)
                 return {"success": True, "copay": copay}
         
         return {"success": False}
 
+# User input parsing
+_DOB_FILLER = re.compile(r'\b(born|on|in|was|i|am|my|dob|is|birthday)\b')
+_DOB_MDY = re.compile(r'(\d{1,2})[/-](\d{1,2})[/-](\d{4})')
+_DOB_YMD = re.compile(r'(\d{4})[/-](\d{1,2})[/-](\d{1,2})')
+_DOB_IN_TEXT = (_DOB_MDY, re.compile(r'born.*?(\d{1,2})[/-](\d{1,2})[/-](\d{4})'))
+_STATE_IN_TEXT = (re.compile(r'\b(?:from|in|live in)\s+([a-zA-Z\s]+)'), re.compile(r'\b([A-Z]{2})\b'))
+_STATE_NAMES = {
+    'al': 'Alabama', 'ak': 'Alaska', 'az': 'Arizona', 'ar': 'Arkansas', 'ca': 'California',
+    'co': 'Colorado', 'ct': 'Connecticut', 'de': 'Delaware', 'dc': 'District Of Columbia',
+    'fl': 'Florida', 'ga': 'Georgia', 'hi': 'Hawaii', 'id': 'Idaho', 'il': 'Illinois',
+    'in': 'Indiana', 'ia': 'Iowa', 'ks': 'Kansas', 'ky': 'Kentucky', 'la': 'Louisiana',
+    'me': 'Maine', 'md': 'Maryland', 'ma': 'Massachusetts', 'mi': 'Michigan', 'mn': 'Minnesota',
+    'ms': 'Mississippi', 'mo': 'Missouri', 'mt': 'Montana', 'ne': 'Nebraska', 'nv': 'Nevada',
+    'nh': 'New Hampshire', 'nj': 'New Jersey', 'nm': 'New Mexico', 'ny': 'New York',
+    'nc': 'North Carolina', 'nd': 'North Dakota', 'oh': 'Ohio', 'ok': 'Oklahoma', 'or': 'Oregon',
+    'pa': 'Pennsylvania', 'ri': 'Rhode Island', 'sc': 'South Carolina', 'sd': 'South Dakota',
+    'tn': 'Tennessee', 'tx': 'Texas', 'ut': 'Utah', 'vt': 'Vermont', 'va': 'Virginia',
+    'wa': 'Washington', 'wv': 'West Virginia', 'wi': 'Wisconsin', 'wy': 'Wyoming'
+}
+
+# Callers repeat the same DOB and state across turns, so normalized values are cached
+@lru_cache(maxsize=512)
+def _normalize_dob(dob_text):
+    """Return a spoken or typed date of birth as MM/DD/YYYY, or None"""
+    if not dob_text:
+        return None
+    
+    cleaned = _DOB_FILLER.sub('', dob_text.lower()).strip()
+    
+    match = _DOB_MDY.search(cleaned)
+    if match:
+        month, day, year = match.groups()
+        return f"{month.zfill(2)}/{day.zfill(2)}/{year}"
+    
+    match = _DOB_YMD.search(cleaned)
+    if match:
+        year, month, day = match.groups()
+        return f"{month.zfill(2)}/{day.zfill(2)}/{year}"
+    
+    return None
+
+@lru_cache(maxsize=512)
+def _normalize_state(state_text):
+    """Return the full name for a state name or code"""
+    if not state_text:
+        return None
+    
+    cleaned = state_text.lower().strip()
+    
+    if cleaned in _STATE_NAMES:
+        return _STATE_NAMES[cleaned]
+    
+    if len(cleaned) > 2:
+        return cleaned.title()
+    
+    return None
+
+# Session fields each insurance call needs
+_DISCOVERY_REQUIRED = ('name', 'date_of_birth', 'state')
+_ELIGIBILITY_REQUIRED = ('name', 'date_of_birth', 'member_id', 'payer', 'provider_name')
+
+# First names used to guess the triage demographic
+_FEMALE_NAMES = frozenset({'mary', 'sarah', 'jessica', 'jennifer', 'amanda'})
+
+_CONFIRMATION_ALPHABET = string.ascii_uppercase + string.digits
+
+_GOODBYE = re.compile(r'\b(?:bye|goodbye|end|quit|hang\s*up)\b', re.IGNORECASE)
+
+# Rule-based answers to the agent's phone, DOB, state and doctor questions
+_PHONE = re.compile(r'\b(?:\+?1[-.\s]?)?\(?\d{3}\)?[-.\s]?\d{3}[-.\s]?\d{4}\b')
+_STATE_FULL_NAME = re.compile(
+    r'\b(' + '|'.join(sorted(map(re.escape, _STATE_NAMES.values()), key=len, reverse=True)) + r')\b',
+    re.IGNORECASE
+)
+_STATE_ABBREVIATION = re.compile(r'^\s*([A-Za-z]{2})\s*\.?\s*$')
+# "Dr. Smith", "doctor Jane Doe": the title, then one or two capitalized names
+_DOCTOR = re.compile(r"\b(?i:dr\.?|doctor)\s+[A-Z][\w'-]*(?:\s+[A-Z][\w'-]*)?")
+_AWAITED_FIELDS = (
+    (re.compile(r'phone', re.IGNORECASE), 'phone'),
+    (re.compile(r'date of birth|birth ?day|born', re.IGNORECASE), 'date_of_birth'),
+    (re.compile(r'\bstate\b', re.IGNORECASE), 'state'),
+    (re.compile(r'which doctor|provider', re.IGNORECASE), 'provider_name'),
+)
+# Scheduling flow order, with the question that asks for each field
+_FIELD_PROMPTS = (
+    ('name', "Could you please tell me your full name?"),
+    ('phone', "What's the best phone number to reach you?"),
+    ('reason', "What's the reason for your visit today?"),
+    ('date_of_birth', "What is your date of birth?"),
+    ('state', "Which state do you live in?"),
+    ('provider_name', "Which doctor would you like to see?"),
+    ('preferred_date', "What date would you like for your appointment?"),
+)
+# Abbreviations that are also common words ("oh", "ok") are left to the LLM
+_AMBIGUOUS_STATE_CODES = frozenset({'hi', 'in', 'me', 'oh', 'ok', 'or'})
+# Inputs with more than this many words besides the value may say something else too
+RULE_MAX_EXTRA_WORDS = 5
+
+class RuleExtractor:
+    """Extracts phone, DOB, state and doctor answers with regexes, so those turns skip the LLM"""
+    
+    @staticmethod
+    def awaited_field(prompt):
+        """Field the agent's last prompt asked for, if it is one the rules can extract"""
+        for pattern, field in _AWAITED_FIELDS:
+            if pattern.search(prompt):
+                return field
+        return None
+    
+    @staticmethod
+    def extract(user_input, field):
+        """Return the raw value for field if the input clearly supplies just that, else None"""
+        if field == 'phone':
+            match = _PHONE.search(user_input)
+        elif field == 'date_of_birth':
+            match = _DOB_MDY.search(user_input) or _DOB_YMD.search(user_input)
+        elif field == 'state':
+            if len(set(m.lower() for m in _STATE_FULL_NAME.findall(user_input))) > 1:
+                return None
+            match = _STATE_FULL_NAME.search(user_input)
+            if not match:
+                # A bare two-letter code, as long as it is not also a common word
+                code = _STATE_ABBREVIATION.match(user_input)
+                if code and code.group(1).lower() in _STATE_NAMES.keys() - _AMBIGUOUS_STATE_CODES:
+                    return code.group(1)
+        elif field == 'provider_name':
+            match = _DOCTOR.search(user_input)
+        else:
+            return None
+        
+        if not match:
+            return None
+        rest = user_input[:match.start()] + user_input[match.end():]
+        if len(rest.split()) > RULE_MAX_EXTRA_WORDS:
+            return None
+        return match.group(0)
+
 # Main Agent
 class HealthcareAgent:
     def __init__(self):
@@ -704,7 +1501,9 @@ class HealthcareAgent:
         if not all([jwt_token, endpoint_url, project_id, connection_id]):
             raise Exception("Missing JWT config")
             
-        self.llm = LLMClient(jwt_token, endpoint_url, project_id, connection_id)
+        # One connection pool for the LLM, insurance and A2A clients
+        self.http = create_async_http_client()
+        self.llm = LLMClient(jwt_token, endpoint_url, project_id, connection_id, self.http)
         
         # Insurance
         mcp_url = os.getenv('MCP_URL')
@@ -712,76 +1511,44 @@ class HealthcareAgent:
         if not mcp_url or not insurance_key:
             raise Exception("Missing insurance config")
             
-        self.insurance = InsuranceClient(mcp_url, insurance_key)
+        self.insurance = InsuranceClient(mcp_url, insurance_key, self.http)
+        
+        # Speculative LLM call for the turn in progress: (transcript, task)
+        self._speculation = None
+        
+        # Field the last response asked for, when the rules can extract it
+        self.awaiting_field = None
+        
+        # Discovery started as soon as its fields were known: ((name, dob, state), task)
+        self._discovery = None
         
         # A2A client
         self.a2a_client = None
         try:
-            self.a2a_client = A2AClient()
+            self.a2a_client = A2AClient(self.http)
         except:
             print("A2A client not available")
     
-    def _normalize_dob(self, dob_text):
-        if not dob_text:
-            return None
-            
-        cleaned = re.sub(r'\b(born|on|in|was|i|am|my|dob|is|birthday)\b', '', dob_text.lower()).strip()
-        
-        match = re.search(r'(\d{1,2})[/-](\d{1,2})[/-](\d{4})', cleaned)
-        if match:
-            month, day, year = match.groups()
-            return f"{month.zfill(2)}/{day.zfill(2)}/{year}"
-        
-        match = re.search(r'(\d{4})[/-](\d{1,2})[/-](\d{1,2})', cleaned)
-        if match:
-            year, month, day = match.groups()
-            return f"{month.zfill(2)}/{day.zfill(2)}/{year}"
-        
-        return None
-    
-    def _normalize_state(self, state_text):
-        if not state_text:
-            return None
-            
-        state_map = {
-            'ca': 'California', 'ny': 'New York', 'tx': 'Texas', 'fl': 'Florida',
-            'il': 'Illinois', 'pa': 'Pennsylvania', 'oh': 'Ohio', 'ga': 'Georgia'
-        }
-        
-        cleaned = state_text.lower().strip()
-        
-        if cleaned in state_map:
-            return state_map[cleaned]
-        
-        if len(cleaned) > 2:
-            return cleaned.title()
-            
-        return None
+    def _set_dob(self, dob):
+        """Store a normalized MM/DD/YYYY date of birth and the age triage will use"""
+        self.session.data["date_of_birth"] = dob
+        self.session.age = max(1, datetime.now().year - int(dob[-4:]))
     
     def _extract_dob_from_text(self, text):
-        patterns = [
-            r'(\d{1,2})[/-](\d{1,2})[/-](\d{4})',
-            r'born.*?(\d{1,2})[/-](\d{1,2})[/-](\d{4})',
-        ]
-        
-        for pattern in patterns:
-            match = re.search(pattern, text.lower())
+        lowered = text.lower()
+        for pattern in _DOB_IN_TEXT:
+            match = pattern.search(lowered)
             if match:
                 return f"{match.group(1).zfill(2)}/{match.group(2).zfill(2)}/{match.group(3)}"
         return None
     
     def _extract_state_from_text(self, text):
-        patterns = [
-            r'\b(?:from|in|live in)\s+([a-zA-Z\s]+)',
-            r'\b([A-Z]{2})\b',
-        ]
-        
-        for pattern in patterns:
-            matches = re.findall(pattern, text)
+        for pattern in _STATE_IN_TEXT:
+            matches = pattern.findall(text)
             if matches:
                 for match in matches:
                     if isinstance(match, str) and match.strip():
-                        normalized = self._normalize_state(match.strip())
+                        normalized = _normalize_state(match.strip())
                         if normalized:
                             return normalized
         return None
@@ -789,6 +1556,12 @@ class HealthcareAgent:
     async def start(self):
         print(f"Healthcare Agent starting - Session {self.session.id}")
         
+        # Connect to the APIs and warm up speech recognition while the greeting plays
+        warm_ups = [self.llm.warm_up(), self.insurance.warm_up(), self.audio.warm_up()]
+        if self.a2a_client:
+            warm_ups.append(self.a2a_client.warm_up())
+        warm_up = asyncio.gather(*warm_ups)
+        
         await self.audio.speak("Hello! I'm your healthcare appointment assistant. To get started, could you please tell me your full name?")
         self.session.add_interaction("assistant", "Hello! I'm your healthcare appointment assistant. To get started, could you please tell me your full name?")
         
@@ -799,9 +1572,9 @@ class HealthcareAgent:
             turn += 1
             print(f"--- Turn {turn} ---")
             
-            user_input = await self.audio.listen()
+            user_input = await self.audio.listen(self._speculate if LLM_SPECULATION else None)
             
-            if user_input in ["UNCLEAR", "TIMEOUT", "ERROR"]:
+            if user_input in _LISTEN_FAILURES:
                 errors += 1
                 await self.audio.speak("I didn't catch that. Could you please repeat?")
                 continue
@@ -813,85 +1586,106 @@ class HealthcareAgent:
             print(f"USER: {user_input}")
             self.session.add_interaction("user", user_input)
             
-            if any(phrase in user_input.lower() for phrase in ['bye', 'goodbye', 'end', 'quit']):
+            if _GOODBYE.search(user_input):
+                self._cancel_speculation()
                 await self.audio.speak("Thank you for calling. Have a great day!")
                 self.session.add_interaction("assistant", "Thank you for calling. Have a great day!")
                 break
             
-            # Process with LLM
-            result = await self.llm.process(user_input, self.session)
+            # Turns that just answer the awaited phone, DOB, state or doctor question skip the LLM
+            result = self._rule_based_turn(user_input)
+            if result is not None:
+                logger.info("RULES: Extracted %s without LLM", result['extract'])
+                self._cancel_speculation()
+                streamed = False
+            else:
+                # Process with LLM, speaking the response while it is still being generated
+                result = await self._take_speculation(user_input)
+                if result is not None:
+                    streamed = False
+                else:
+                    sentences = asyncio.Queue()
+                    speaker = asyncio.create_task(self.audio.speak_stream(sentences))
+                    result = await self.llm.process(user_input, self.session, sentences)
+                    streamed = await speaker
             
             # Update session with better extraction
             if result.get("extract"):
-                print(f"SESSION-UPDATE: Before - {self.session.data}")
+                logger.debug("SESSION-UPDATE: Before - %s", self.session.data)
                 
                 extractions = result["extract"]
                 for key, value in extractions.items():
                     if key == "date_of_birth" and value:
-                        normalized_dob = self._normalize_dob(value)
+                        normalized_dob = _normalize_dob(value)
                         if normalized_dob:
-                            self.session.data[key] = normalized_dob
-                            print(f"SESSION-UPDATE: Normalized DOB '{value}' to '{normalized_dob}'")
+                            self._set_dob(normalized_dob)
+                            logger.info("SESSION-UPDATE: Normalized DOB '%s' to '%s'", value, normalized_dob)
                     elif key == "state" and value:
-                        normalized_state = self._normalize_state(value)
+                        normalized_state = _normalize_state(value)
                         if normalized_state:
                             self.session.data[key] = normalized_state
-                            print(f"SESSION-UPDATE: Normalized state '{value}' to '{normalized_state}'")
+                            logger.info("SESSION-UPDATE: Normalized state '%s' to '%s'", value, normalized_state)
                     elif value:
                         self.session.data[key] = value
+                        if key == "name":
+                            self.session.sex = "female" if not _FEMALE_NAMES.isdisjoint(str(value).lower().split()) else "male"
                 
-                print(f"SESSION-UPDATE: After - {self.session.data}")
+                logger.debug("SESSION-UPDATE: After - %s", self.session.data)
             
             # Additional extraction if missing
             if not self.session.data.get("date_of_birth"):
                 dob_extracted = self._extract_dob_from_text(user_input)
                 if dob_extracted:
-                    self.session.data["date_of_birth"] = dob_extracted
-                    print(f"SESSION-UPDATE: Additional DOB: '{dob_extracted}'")
+                    self._set_dob(dob_extracted)
+                    logger.info("SESSION-UPDATE: Additional DOB: '%s'", dob_extracted)
             
             if not self.session.data.get("state"):
                 state_extracted = self._extract_state_from_text(user_input)
                 if state_extracted:
                     self.session.data["state"] = state_extracted
-                    print(f"SESSION-UPDATE: Additional state: '{state_extracted}'")
+                    logger.info("SESSION-UPDATE: Additional state: '%s'", state_extracted)
+            
+            # Start discovery as soon as name, DOB and state are known, before
+            # the LLM asks for it, so the lookup runs under the next turns
+            self._prefetch_discovery()
+            
+            discovery_task = None
+            if result.get("call_discovery"):
+                missing = self.session.data.missing(_DISCOVERY_REQUIRED)
+                logger.debug("INSURANCE-DISCOVERY: Required fields check")
+                logger.debug("INSURANCE-DISCOVERY: Session data: %s", self.session.data)
+                
+                if not missing:
+                    discovery_task = self._discovery[1]
+                    logger.info("INSURANCE-DISCOVERY: Using prefetched lookup (%s)",
+                                "ready" if discovery_task.done() else "in flight")
+                else:
+                    logger.info("INSURANCE-DISCOVERY: Missing: %s", missing)
             
             # Handle triage
             if (result.get("need_triage") and 
                 not self.session.triage_complete and 
                 self.session.triage_attempts < 1 and 
                 self.a2a_client):
-                print("TRIAGE: Starting session")
+                logger.info("TRIAGE: Starting session")
                 await self._run_triage()
             
             # Handle discovery
-            if result.get("call_discovery"):
-                required = ['name', 'date_of_birth', 'state']
-                print(f"INSURANCE-DISCOVERY: Required fields check")
-                print(f"INSURANCE-DISCOVERY: Session data: {self.session.data}")
-                
-                if all(k in self.session.data and self.session.data[k] for k in required):
-                    print("INSURANCE-DISCOVERY: Calling API...")
-                    discovery = await self.insurance.discovery(
-                        self.session.data['name'],
-                        self.session.data['date_of_birth'],
-                        self.session.data['state']
-                    )
-                    if discovery["success"]:
-                        self.session.data['payer'] = discovery['payer']
-                        self.session.data['member_id'] = discovery['member_id']
-                        print(f"INSURANCE-DISCOVERY: Success - {discovery['payer']}, {discovery['member_id']}")
-                else:
-                    missing = [k for k in required if k not in self.session.data or not self.session.data[k]]
-                    print(f"INSURANCE-DISCOVERY: Missing: {missing}")
+            if discovery_task is not None:
+                discovery = await discovery_task
+                if discovery["success"]:
+                    self.session.data['payer'] = discovery['payer']
+                    self.session.data['member_id'] = discovery['member_id']
+                    logger.info("INSURANCE-DISCOVERY: Success - %s, %s", discovery['payer'], discovery['member_id'])
             
             # Handle eligibility
             if result.get("call_eligibility"):
-                required = ['name', 'date_of_birth', 'member_id', 'payer', 'provider_name']
-                print(f"INSURANCE-ELIGIBILITY: Required fields check")
-                print(f"INSURANCE-ELIGIBILITY: Session data: {self.session.data}")
+                missing = self.session.data.missing(_ELIGIBILITY_REQUIRED)
+                logger.debug("INSURANCE-ELIGIBILITY: Required fields check")
+                logger.debug("INSURANCE-ELIGIBILITY: Session data: %s", self.session.data)
                 
-                if all(k in self.session.data and self.session.data[k] for k in required):
-                    print("INSURANCE-ELIGIBILITY: Calling API...")
+                if not missing:
+                    logger.info("INSURANCE-ELIGIBILITY: Calling API...")
                     eligibility = await self.insurance.eligibility(
                         self.session.data['name'],
                         self.session.data['date_of_birth'],
@@ -908,24 +1702,26 @@ class HealthcareAgent:
                         await self.audio.speak(fallback_message)
                         self.session.add_interaction("assistant", fallback_message)
                 else:
-                    missing = [k for k in required if k not in self.session.data or not self.session.data[k]]
-                    print(f"INSURANCE-ELIGIBILITY: Missing: {missing}")
+                    logger.info("INSURANCE-ELIGIBILITY: Missing: %s", missing)
             
             # Speak response
             response = result.get("response", "")
+            self.awaiting_field = RuleExtractor.awaited_field(response)
             if response:
-                await self.audio.speak(response)
+                if not streamed:
+                    await self.audio.speak(response)
                 self.session.add_interaction("assistant", response)
             
             # Check if done
             if result.get("done"):
                 if self.session.data.get('name') and self.session.data.get('preferred_date'):
-                    confirmation = ''.join(random.choices(string.ascii_uppercase + string.digits, k=5))
+                    confirmation = ''.join(secrets.choice(_CONFIRMATION_ALPHABET) for _ in range(5))
                     confirmation_message = f"Perfect! Your appointment is confirmed. Your confirmation number is {confirmation}. Thank you!"
                     await self.audio.speak(confirmation_message)
                     self.session.add_interaction("assistant", confirmation_message)
                 break
         
+        await warm_up
         print(f"Conversation ended. Final data: {self.session.data}")
         
         # Save session
@@ -933,42 +1729,120 @@ class HealthcareAgent:
         if saved_file:
             print(f"Session saved to: {saved_file}")
     
+    async def close(self):
+        """Close the pooled connections of the HTTP clients"""
+        if self._discovery is not None:
+            self._discovery[1].cancel()
+        await self.llm.close()
+        await self.insurance.close()
+        if self.a2a_client:
+            await self.a2a_client.close()
+        await self.http.aclose()
+    
+    def _prefetch_discovery(self):
+        """Start insurance discovery once for each set of name, DOB and state"""
+        key = tuple(self.session.data.get(k) for k in ('name', 'date_of_birth', 'state'))
+        if not all(key):
+            return
+        
+        if self._discovery is not None:
+            previous_key, task = self._discovery
+            # Reuse a lookup in flight or one that succeeded; retry a failed one
+            if previous_key == key and not (task.done() and not self._discovery_succeeded(task)):
+                return
+            task.cancel()
+        logger.info("INSURANCE-DISCOVERY: Calling API...")
+        self._discovery = (key, asyncio.create_task(self.insurance.discovery(*key)))
+    
+    @staticmethod
+    def _discovery_succeeded(task):
+        return not task.cancelled() and task.exception() is None and task.result()["success"]
+    
+    def _speculate(self, partial):
+        """Start the LLM on a partial transcript while the user may still be speaking"""
+        self._cancel_speculation()
+        # Goodbyes and rule-answered turns never reach the LLM, so do not start a call for them
+        if self._answers_without_llm(partial):
+            return
+        logger.info("LLM: Speculating on '%s...'", partial[:50])
+        self._speculation = (partial, asyncio.create_task(self.llm.process(partial, self.session)))
+    
+    def _answers_without_llm(self, user_input):
+        return bool(_GOODBYE.search(user_input)) or self._rule_based_turn(user_input) is not None
+    
+    def _cancel_speculation(self):
+        if self._speculation is not None:
+            self._speculation[1].cancel()
+            self._speculation = None
+    
+    def _rule_based_turn(self, user_input):
+        """Build the LLM-shaped result for a turn the rules can answer, or None"""
+        field = self.awaiting_field
+        value = RuleExtractor.extract(user_input, field) if field else None
+        if value is None:
+            return None
+        
+        data = {**self.session.data, field: value}
+        
+        # Whether a stated reason needs triage is the LLM's call
+        triage_settled = (self.session.triage_complete or self.session.triage_attempts >= 1
+                          or not self.a2a_client)
+        if data.get('reason') and not triage_settled:
+            return None
+        
+        next_prompt = next((prompt for key, prompt in _FIELD_PROMPTS if not data.get(key)), None)
+        if next_prompt is None:
+            return None
+        
+        return {
+            "response": next_prompt,
+            "extract": {field: value},
+            "need_triage": False,
+            "call_discovery": (field in ('date_of_birth', 'state') and not data.get('payer')
+                               and all(data.get(k) for k in ('name', 'date_of_birth', 'state'))),
+            "call_eligibility": field == 'provider_name' and all(data.get(k) for k in _ELIGIBILITY_REQUIRED),
+            "done": False
+        }
+    
+    async def _take_speculation(self, user_input):
+        """Return the speculative LLM result if it was made for exactly this input"""
+        speculation, self._speculation = self._speculation, None
+        if speculation is None:
+            return None
+        
+        partial, task = speculation
+        if partial != user_input:
+            task.cancel()
+            return None
+        
+        try:
+            return await task
+        except Exception:
+            return None
+    
     async def _run_triage(self):
         """Run A2A triage session until complete"""
         self.session.triage_attempts += 1
-        print(f"TRIAGE: Starting attempt {self.session.triage_attempts}")
+        logger.info("TRIAGE: Starting attempt %s", self.session.triage_attempts)
         
         try:
             # Demographics
-            age = 30
-            sex = "male"
+            age = self.session.age or 30
+            sex = self.session.sex or "male"
+            logger.info("TRIAGE: Demographics - Age: %s, Sex: %s", age, sex)
             
-            if 'date_of_birth' in self.session.data:
-                try:
-                    dob = self.session.data['date_of_birth']
-                    if '/' in dob:
-                        parts = dob.split('/')
-                        if len(parts) == 3:
-                            birth_year = int(parts[2])
-                            age = max(1, datetime.now().year - birth_year)
-                            print(f"TRIAGE: Calculated age: {age}")
-                except Exception as e:
-                    print(f"TRIAGE: Age calculation failed: {e}")
-            
-            name = self.session.data.get('name', '').lower()
-            if any(f in name for f in ['mary', 'sarah', 'jessica', 'jennifer', 'amanda']):
-                sex = "female"
-            
-            print(f"TRIAGE: Demographics - Age: {age}, Sex: {sex}")
+            # Start triage while the intro is spoken; the service needs a token,
+            # a survey and a first message before it has a question to ask
+            complaint = self.session.data.get('reason', 'general concern')
+            logger.info("TRIAGE: Chief complaint: '%s'", complaint)
             
             triage_intro = "I need to ask some medical questions to assess your condition."
-            await self.audio.speak(triage_intro)
             self.session.add_interaction("assistant", triage_intro)
-            
-            # Start triage
-            complaint = self.session.data.get('reason', 'general concern')
-            print(f"TRIAGE: Chief complaint: '{complaint}'")
-            start_result = await self.a2a_client.start_triage(age, sex, complaint)
+            intro = asyncio.create_task(self.audio.speak(triage_intro))
+            try:
+                start_result = await self.a2a_client.start_triage(age, sex, complaint)
+            finally:
+                await intro
             
             if start_result.get("success") and start_result.get("response"):
                 await self.audio.speak(start_result["response"])
@@ -976,15 +1850,15 @@ class HealthcareAgent:
             
             # Triage conversation - unlimited turns until complete
             turn = 0
-            print("TRIAGE: Starting conversation loop")
+            logger.info("TRIAGE: Starting conversation loop")
             
             while True:
                 turn += 1
-                print(f"TRIAGE: Turn {turn}")
+                logger.info("TRIAGE: Turn %s", turn)
                 
                 user_input = await self.audio.listen()
                 
-                if user_input in ["UNCLEAR", "TIMEOUT", "ERROR"]:
+                if user_input in _LISTEN_FAILURES:
                     retry_message = "I didn't catch that. Please try again."
                     await self.audio.speak(retry_message)
                     continue
@@ -994,31 +1868,34 @@ class HealthcareAgent:
                 
                 message_result = await self.a2a_client.send_triage_message(user_input)
                 
+                state = str(message_result.get("state", "")).lower()
+                logger.info("TRIAGE: Current state: '%s'", state)
+                
+                # Fetch the summary while the last answer is spoken
+                if state in _TERMINAL_STATES or turn >= 30:
+                    logger.info("TRIAGE: Getting summary...")
+                    summary_task = asyncio.create_task(self.a2a_client.get_summary())
+                
                 if message_result.get("success") and message_result.get("response"):
                     await self.audio.speak(message_result["response"])
                     self.session.add_interaction("assistant", message_result["response"])
                 
-                state = message_result.get("state", "").lower()
-                print(f"TRIAGE: Current state: '{state}'")
-                
-                if state in ["completed", "finished", "done"]:
-                    print(f"TRIAGE: Completed after turn {turn}")
+                if state in _TERMINAL_STATES:
+                    logger.info("TRIAGE: Completed after turn %s", turn)
                     break
                 
                 if turn >= 30:
-                    print(f"TRIAGE: Safety limit reached ({turn} turns)")
+                    logger.info("TRIAGE: Safety limit reached (%s turns)", turn)
                     break
             
-            # Get summary
-            print("TRIAGE: Getting summary...")
-            summary = await self.a2a_client.get_summary()
+            summary = await summary_task
             
             if summary.get("success"):
                 self.session.triage_complete = True
                 urgency = summary["urgency_level"]
                 doctor = summary["doctor_type"]
                 
-                print(f"TRIAGE: Assessment - {urgency} priority, {doctor}")
+                logger.info("TRIAGE: Assessment - %s priority, %s", urgency, doctor)
                 
                 self.session.data['triage_urgency'] = urgency
                 self.session.data['triage_doctor'] = doctor
@@ -1027,7 +1904,7 @@ class HealthcareAgent:
                 await self.audio.speak(summary_message)
                 self.session.add_interaction("assistant", summary_message)
             else:
-                print("TRIAGE: Summary failed, marking complete")
+                logger.warning("TRIAGE: Summary failed, marking complete")
                 self.session.triage_complete = True
                 
                 fallback_message = "I've completed the medical assessment. Now let me help schedule your appointment."
@@ -1035,7 +1912,7 @@ class HealthcareAgent:
                 self.session.add_interaction("assistant", fallback_message)
                 
         except Exception as e:
-            print(f"TRIAGE: Error: {e}")
+            logger.warning("TRIAGE: Error: %s", e)
             self.session.triage_complete = True
             
             error_message = "I'll help you schedule an appointment with a healthcare provider."
@@ -1081,15 +1958,33 @@ def run_agent():
     else:
         print("Console mode only")
     
+    if os.getenv('A2A_IN_PROCESS') == '1':
+        triage_required = ['TRIAGE_APP_ID', 'TRIAGE_APP_KEY', 'TRIAGE_INSTANCE_ID', 'TRIAGE_TOKEN_URL', 'TRIAGE_BASE_URL']
+        missing = [var for var in triage_required if not os.getenv(var)]
+        if missing:
+            print(f"ERROR: Missing config for in-process triage: {missing}")
+            return
+        # Registers itself, so the agent's A2A client calls it directly
+        service = A2ATriageService()
+        service.start_token_refresh()
+        print("Triage service running in-process")
+    
     async def start():
         agent = HealthcareAgent()
-        await agent.start()
+        try:
+            await agent.start()
+        finally:
+            await agent.close()
     
-    asyncio.run(start())
+    # uvloop's libuv event loop has less per-callback overhead than asyncio's; optional
+    try:
+        import uvloop
+    except ImportError:
+        asyncio.run(start())
+    else:
+        uvloop.run(start())
 
 def main():
-    import sys
-    
     if len(sys.argv) > 1 and sys.argv[1] == "service":
         run_service()
     else:
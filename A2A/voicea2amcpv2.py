@@ -1,21 +1,41 @@
 """
 Healthcare Voice + A2A + MCP Agent
 """
+import sys
+
+# The triage service serves concurrent tasks with gevent when it is installed:
+# patch the standard library before anything imports sockets, so blocking triage
+# API calls yield to other requests. The voice agent runs on asyncio and is not patched.
+if __name__ == "__main__" and sys.argv[1:2] == ["service"]:
+    try:
+        from gevent import monkey
+        monkey.patch_all()
+    except ImportError:
+        pass
+
 import asyncio
-import json
+import io
 import os
 import re
 import base64
-import uuid
-import random
+import hashlib
+import secrets
 import string
-import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from collections import OrderedDict, deque
+from itertools import islice
 from datetime import datetime
+from functools import lru_cache
 from typing import Dict, Optional, List, Any
 from enum import Enum
 
+import orjson
 import requests
-from flask import Flask, request, jsonify
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from flask import Flask, Response, request
 
 # Audio imports with fallback
 try:
@@ -36,6 +56,23 @@ def load_env():
 
 load_env()
 
+# HTTP
+def create_http_session(pool_maxsize=16):
+    """Session that keeps connections alive between calls and retries failed connects"""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_maxsize=pool_maxsize, max_retries=Retry(total=2, backoff_factor=0.2))
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+# The agent's blocking HTTP calls get their own threads, so they never queue
+# behind listening or TTS playback in the default executor (or the reverse)
+_HTTP_EXECUTOR = ThreadPoolExecutor(max_workers=8, thread_name_prefix='agent-http')
+
+async def run_blocking_http(func):
+    """Run a blocking requests call on the HTTP executor and await its result"""
+    return await asyncio.get_running_loop().run_in_executor(_HTTP_EXECUTOR, func)
+
 # Task States per A2A spec
 class TaskState(str, Enum):
     SUBMITTED = "submitted"
@@ -49,64 +86,148 @@ class TaskState(str, Enum):
     UNKNOWN = "unknown"
 
 # Session Management
+class SessionData(dict):
+    """Collected session fields; counts assignments and remembers the ones not yet logged"""
+    
+    __slots__ = ('version', 'pending', 'filled', '_json', '_json_version')
+    
+    def __init__(self):
+        super().__init__()
+        self.version = 0
+        self.pending = {}
+        self.filled = set()
+        self._json = '{}'
+        self._json_version = 0
+    
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        self.version += 1
+        self.pending[key] = value
+        if value:
+            self.filled.add(key)
+        else:
+            self.filled.discard(key)
+    
+    def update(self, *args, **kwargs):
+        for key, value in dict(*args, **kwargs).items():
+            self[key] = value
+    
+    def missing(self, fields):
+        """Return the given fields that have no value yet, in order"""
+        return [key for key in fields if key not in self.filled]
+    
+    def to_json(self):
+        """Serialized fields for the LLM prompt, re-encoded only after a field has been set"""
+        if self._json_version != self.version:
+            self._json = orjson.dumps(self, default=str).decode()
+            self._json_version = self.version
+        return self._json
+    
+    def take_changes(self):
+        """Return the fields assigned since the last call"""
+        changes, self.pending = self.pending, {}
+        return changes
+
 class Session:
+    """Patient session; interactions are appended to a JSONL transcript as they
+    happen, and a small metadata JSON file is written on save. Transcript entries
+    carry the data version plus any fields set since the previous entry, so the
+    data at any point can be rebuilt by replaying "data_changes" from the start."""
+    
     def __init__(self):
-        self.id = str(uuid.uuid4())[:8]
-        self.data = {}
+        self.id = secrets.token_hex(4)
+        self.data = SessionData()
         self.triage_complete = False
         self.triage_attempts = 0
-        self.conversation_log = []
+        self.interaction_count = 0
         self.start_time = datetime.now()
         self.triage_task_id = None
         self.triage_context_id = None
-        self.triage_results = {}
+        self.triage_results = SessionData()
         self.in_triage_mode = False
+        self.file_prefix = f"sessions/session_{self.start_time.strftime('%Y%m%d_%H%M%S')}_{self.id}"
+        self._transcript = None
+        os.makedirs("sessions", exist_ok=True)
     
     def add_interaction(self, role, message, extra_data=None):
         interaction = {
             "timestamp": datetime.now().isoformat(),
             "role": role,
             "message": message,
-            "session_data_snapshot": self.data.copy()
+            "data_version": self.data.version
         }
+        changes = self.data.take_changes()
+        if changes:
+            interaction["data_changes"] = changes
         if extra_data:
             interaction["extra_data"] = extra_data
-        self.conversation_log.append(interaction)
+        self._append_transcript(interaction)
+        self.interaction_count += 1
         print(f"SESSION-LOG: {role.upper()} - {message[:100]}...")
     
+    def _append_transcript(self, interaction):
+        try:
+            if self._transcript is None:
+                # Unbuffered: each entry is a single write, so it reaches disk as it happens
+                self._transcript = open(f"{self.file_prefix}.jsonl", 'ab', buffering=0)
+            self._transcript.write(orjson.dumps(interaction, default=str, option=orjson.OPT_APPEND_NEWLINE))
+        except Exception as e:
+            print(f"SESSION: Transcript write failed: {e}")
+    
     def save_to_file(self):
         try:
-            os.makedirs("sessions", exist_ok=True)
-            filename = f"sessions/session_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{self.id}.json"
+            filename = f"{self.file_prefix}.json"
+            now = datetime.now()
             
             session_data = {
                 "session_id": self.id,
                 "start_time": self.start_time.isoformat(),
-                "end_time": datetime.now().isoformat(),
-                "duration_minutes": (datetime.now() - self.start_time).total_seconds() / 60,
+                "end_time": now.isoformat(),
+                "duration_minutes": (now - self.start_time).total_seconds() / 60,
                 "final_data": self.data,
                 "triage_complete": self.triage_complete,
                 "triage_attempts": self.triage_attempts,
-                "conversation_log": self.conversation_log,
+                "transcript_file": f"{self.file_prefix}.jsonl",
                 "data_fields_collected": list(self.data.keys()),
-                "total_interactions": len(self.conversation_log)
+                "total_interactions": self.interaction_count
             }
             
-            with open(filename, 'w') as f:
-                json.dump(session_data, f, indent=2, default=str)
+            # Every field is a JSON type orjson encodes natively, so no default= fallback
+            with open(filename, 'wb') as f:
+                f.write(orjson.dumps(session_data, option=orjson.OPT_INDENT_2))
             
-            print(f"SESSION: Saved complete session to {filename}")
+            if self._transcript is not None:
+                # Entries were written as they happened; make sure they are on disk at call end
+                os.fsync(self._transcript.fileno())
+                self._transcript.close()
+                self._transcript = None
+            
+            print(f"SESSION: Saved session to {filename} (transcript: {self.file_prefix}.jsonl)")
             return filename
         except Exception as e:
             print(f"SESSION: Save failed: {e}")
             return None
 
 # Audio System
+# Prompts and confirmations repeat within and across calls; keep the MP3 of the
+# most recently spoken texts (a sentence is a few tens of KB)
+TTS_CACHE_SIZE = 128
+# gTTS serves fixed 32 kbps MP3, so a clip's length follows from its size
+GTTS_BITRATE = 32000
+
 class AudioSystem:
     def __init__(self):
         self.enabled = AUDIO_AVAILABLE
         self.tts_enabled = False
         self.speech_enabled = False
+        self._audio_cache = OrderedDict()  # text -> MP3 bytes, least recently spoken first
+        self._audio_cache_lock = threading.Lock()
+        # Voice I/O gets its own threads so a slow recognition or long prompt never
+        # waits behind HTTP work; one each, as there is one microphone and one mixer
+        self._stt_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix='stt')
+        self._tts_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix='tts')
+        # Streamed sentences are synthesized here while the previous one plays
+        self._render_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix='tts-render')
         
         if self.enabled:
             try:
@@ -160,8 +281,48 @@ class AudioSystem:
             except Exception:
                 return "ERROR"
         
-        loop = asyncio.get_event_loop()
-        return await loop.run_in_executor(None, _listen)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._stt_pool, _listen)
+    
+    def _synthesize(self, text):
+        """Render text to MP3 in memory with gTTS"""
+        audio = io.BytesIO()
+        gTTS(text=text, lang='en', slow=False).write_to_fp(audio)
+        audio.seek(0)
+        return audio
+    
+    def _render(self, text):
+        """MP3 for text, synthesized only if it is not cached"""
+        # Renders run on several threads; the lock covers the cache, not the synthesis
+        with self._audio_cache_lock:
+            audio = self._audio_cache.get(text)
+            if audio is not None:
+                self._audio_cache.move_to_end(text)
+        if audio is None:
+            audio = self._synthesize(text).getvalue()
+            with self._audio_cache_lock:
+                self._audio_cache[text] = audio
+                if len(self._audio_cache) > TTS_CACHE_SIZE:
+                    self._audio_cache.popitem(last=False)
+        return io.BytesIO(audio)
+    
+    def _play(self, audio):
+        """Play rendered MP3 audio to the end"""
+        max_wait = 30
+        duration = audio.getbuffer().nbytes * 8 / GTTS_BITRATE
+        pygame.mixer.music.load(audio, 'mp3')
+        pygame.mixer.music.play()
+        
+        # The music end event would need pygame's video subsystem, which a console
+        # agent does not start; sleep through most of the clip in one wait instead
+        # and only poll the tail, so playback ends without extra latency
+        deadline = time.monotonic() + max_wait
+        time.sleep(min(duration * 0.9, max_wait))
+        while pygame.mixer.music.get_busy() and time.monotonic() < deadline:
+            pygame.time.wait(50)
+        
+        if pygame.mixer.music.get_busy():
+            pygame.mixer.music.stop()
     
     async def speak(self, text):
         print(f"Agent: {text}")
@@ -172,53 +333,145 @@ class AudioSystem:
         
         def _speak():
             try:
-                tts = gTTS(text=text, lang='en', slow=False)
-                
-                with tempfile.NamedTemporaryFile(suffix='.mp3', delete=False) as tmp:
-                    temp_file = tmp.name
-                
-                try:
-                    tts.save(temp_file)
-                    pygame.mixer.music.load(temp_file)
-                    pygame.mixer.music.play()
-                    
-                    max_wait = 30
-                    wait_count = 0
-                    while pygame.mixer.music.get_busy() and wait_count < max_wait * 20:
-                        pygame.time.wait(50)
-                        wait_count += 1
-                    
-                    if pygame.mixer.music.get_busy():
-                        pygame.mixer.music.stop()
-                        
-                finally:
-                    try:
-                        os.unlink(temp_file)
-                    except Exception:
-                        pass
-                        
+                self._play(self._render(text))
                 return True
-                        
             except Exception as e:
                 print(f"TTS error: {e}")
                 return False
         
         if self.tts_enabled:
             try:
-                loop = asyncio.get_event_loop()
+                loop = asyncio.get_running_loop()
                 await asyncio.wait_for(
-                    loop.run_in_executor(None, _speak), 
+                    loop.run_in_executor(self._tts_pool, _speak), 
                     timeout=35
                 )
             except Exception as e:
                 print(f"TTS: Error: {e}")
+    
+    async def _play_rendered(self, rendered):
+        """Wait for a render future and play the result"""
+        try:
+            audio = await rendered
+            loop = asyncio.get_running_loop()
+            await asyncio.wait_for(loop.run_in_executor(self._tts_pool, self._play, audio), timeout=35)
+        except Exception as e:
+            print(f"TTS error: {e}")
+    
+    async def speak_stream(self, sentences):
+        """Speak sentences from a queue until None; returns whether anything was spoken.
+        
+        Each sentence is synthesized while the one before it is playing, so
+        playback does not stop for a gTTS round trip between sentences.
+        """
+        loop = asyncio.get_running_loop()
+        rendered = asyncio.Queue(maxsize=2)
+        
+        async def render():
+            while (sentence := await sentences.get()) is not None:
+                synthesis = loop.run_in_executor(self._render_pool, self._render, sentence) if self.tts_enabled else None
+                await rendered.put((sentence, synthesis))
+            await rendered.put(None)
+        
+        renderer = asyncio.create_task(render())
+        spoken = False
+        while (item := await rendered.get()) is not None:
+            sentence, synthesis = item
+            print(f"Agent: {sentence}")
+            spoken = True
+            if synthesis is not None:
+                await self._play_rendered(synthesis)
+        await renderer
+        return spoken
+
+# Demographics in the opening triage message
+_AGE_PATTERNS = (
+    re.compile(r'\b(\d{1,2})\s*(?:years?\s*old|yo)\b'),
+    re.compile(r'\bage\s*(?:is\s*)?(\d{1,2})\b'),
+    re.compile(r'\bi\s*am\s*(\d{1,2})\b')
+)
+_WORD = re.compile(r'[a-z]+')
+_MALE_WORDS = frozenset({'male', 'man', 'boy', 'he', 'his', 'him'})
+_FEMALE_WORDS = frozenset({'female', 'woman', 'girl', 'she', 'her'})
+
+def _json_response(obj):
+    """Serialize a response body with orjson, which emits UTF-8 bytes directly"""
+    return Response(orjson.dumps(obj, default=str), mimetype='application/json')
+
+def _conditional_json_response(body, etag):
+    """Serve a pre-serialized JSON body, answering 304 when the client already has it"""
+    response = Response(body, mimetype='application/json')
+    response.set_etag(etag)
+    return response.make_conditional(request)
+
+# Task storage bounds: idle tasks expire after TASK_TTL_SECONDS, the least recently
+# used are evicted beyond MAX_TASKS, and only the last MAX_TASK_HISTORY messages are kept
+MAX_TASKS = int(os.getenv('A2A_MAX_TASKS', '10000'))
+TASK_TTL_SECONDS = int(os.getenv('A2A_TASK_TTL_SECONDS', '3600'))
+MAX_TASK_HISTORY = 64
+
+class TaskStore:
+    """Bounded, thread-safe in-memory store with LRU eviction and an idle TTL
+    
+    Entries are kept in access order, so expired entries are always at the front
+    and can be dropped without scanning the whole store.
+    """
+    
+    def __init__(self, maxsize=MAX_TASKS, ttl=TASK_TTL_SECONDS):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._items = OrderedDict()  # key -> (value, last_access)
+        self._lock = threading.Lock()
+    
+    def _expire(self, now):
+        """Drop entries that have been idle longer than the TTL"""
+        items = self._items
+        while items:
+            key, (value, last_access) = next(iter(items.items()))
+            if now - last_access < self.ttl:
+                break
+            del items[key]
+    
+    def get(self, key):
+        """Return the value for key and mark it as recently used, or None"""
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            entry = self._items.get(key)
+            if entry is None:
+                return None
+            self._items[key] = (entry[0], now)
+            self._items.move_to_end(key)
+            return entry[0]
+    
+    def set(self, key, value):
+        """Insert or replace a value, evicting the least recently used entries if full"""
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            self._items[key] = (value, now)
+            self._items.move_to_end(key)
+            while len(self._items) > self.maxsize:
+                evicted, _ = self._items.popitem(last=False)
+                print(f"A2A-SERVICE: Evicted task {evicted} from task store (capacity {self.maxsize})")
+    
+    def __len__(self):
+        with self._lock:
+            self._expire(time.monotonic())
+            return len(self._items)
+
+def _task_view(task, history_length=None):
+    """A2A task object with the history ring buffer copied out as a list"""
+    # Copy only the visible window out of the history ring buffer
+    history = task['history']
+    skip = max(0, len(history) - history_length) if history_length else 0
+    return {**task, "history": list(islice(history, skip, None))}
 
 # A2A Triage Service with proper state mapping
 class A2ATriageService:
     def __init__(self):
         self.app = Flask(__name__)
-        self.tasks = {}
-        self.contexts = {}
+        self.tasks = TaskStore()
         
         # Triage API credentials
         self.app_id = os.getenv('TRIAGE_APP_ID')
@@ -226,92 +479,110 @@ class A2ATriageService:
         self.instance_id = os.getenv('TRIAGE_INSTANCE_ID')
         self.token_url = os.getenv('TRIAGE_TOKEN_URL')
         self.base_url = os.getenv('TRIAGE_BASE_URL')
+        self.http = create_http_session()
+        
+        # One client-credentials token is shared by all tasks until shortly before it expires
+        self._token = None
+        self._token_expires = 0
+        self._token_lock = threading.Lock()
+        
+        self._agent_card = self._build_agent_card()
+        
+        # JSON-RPC method -> handler
+        self._rpc_dispatch = {
+            'message/send': self._handle_message_send,
+            'tasks/get': self._handle_tasks_get,
+            'tasks/cancel': self._handle_tasks_cancel
+        }
         
         self.setup_routes()
     
+    def _build_agent_card(self):
+        """Serialized agent card and its ETag; the card is static, so this runs once"""
+        card = {
+            "name": "Medical Triage Agent A2A service",
+            "description": "A2A service for AI agent that performs medical symptom triage and assessment using professional medical protocols",
+            "url": "http://localhost:8887",
+            "provider": {
+                "organization": "",
+                "url": ""
+            },
+            "iconUrl": "http://localhost:8887/icon.png",
+            "version": "1.0.0",
+            "documentationUrl": "http://localhost:8887/docs",
+            "capabilities": {
+                "streaming": False,
+                "pushNotifications": False,
+                "stateTransitionHistory": False,
+                "extensions": []
+            },
+            "securitySchemes": {
+                "noAuth": {
+                    "type": "http",
+                    "scheme": "none"
+                }
+            },
+            "security": [],
+            "defaultInputModes": ["text/plain", "application/json"],
+            "defaultOutputModes": ["text/plain", "application/json"],
+            "skills": [
+                {
+                    "id": "medical-triage",
+                    "name": "Medical Symptom Triage",
+                    "description": "Performs comprehensive medical symptom assessment and triage using AI-powered clinical protocols",
+                    "tags": ["healthcare", "triage", "medical", "symptoms", "diagnosis"],
+                    "examples": [
+                        "I have chest pain and shortness of breath",
+                        "My child has a fever and headache",
+                        "I'm experiencing severe abdominal pain"
+                    ],
+                    "inputModes": ["text/plain", "application/json"],
+                    "outputModes": ["text/plain", "application/json"]
+                }
+            ],
+            "supportsAuthenticatedExtendedCard": False
+        }
+        body = orjson.dumps(card)
+        return body, hashlib.blake2b(body, digest_size=16).hexdigest()
+    
     def setup_routes(self):
         # FIXED Agent Card
         @self.app.route('/.well-known/agent-card.json', methods=['GET'])
         def agent_card():
-            return jsonify({
-                "name": "Medical Triage Agent A2A service",
-                "description": "A2A service for AI agent that performs medical symptom triage and assessment using professional medical protocols",
-                "url": "http://localhost:8887",
-                "provider": {
-                    "organization": "",
-                    "url": ""
-                },
-                "iconUrl": "http://localhost:8887/icon.png",
-                "version": "1.0.0",
-                "documentationUrl": "http://localhost:8887/docs",
-                "capabilities": {
-                    "streaming": False,
-                    "pushNotifications": False,
-                    "stateTransitionHistory": False,
-                    "extensions": []
-                },
-                "securitySchemes": {
-                    "noAuth": {
-                        "type": "http",
-                        "scheme": "none"
-                    }
-                },
-                "security": [],
-                "defaultInputModes": ["text/plain", "application/json"],
-                "defaultOutputModes": ["text/plain", "application/json"],
-                "skills": [
-                    {
-                        "id": "medical-triage",
-                        "name": "Medical Symptom Triage",
-                        "description": "Performs comprehensive medical symptom assessment and triage using AI-powered clinical protocols",
-                        "tags": ["healthcare", "triage", "medical", "symptoms", "diagnosis"],
-                        "examples": [
-                            "I have chest pain and shortness of breath",
-                            "My child has a fever and headache",
-                            "I'm experiencing severe abdominal pain"
-                        ],
-                        "inputModes": ["text/plain", "application/json"],
-                        "outputModes": ["text/plain", "application/json"]
-                    }
-                ],
-                "supportsAuthenticatedExtendedCard": False
-            })
+            response = _conditional_json_response(*self._agent_card)
+            # The card never changes while the service runs
+            response.cache_control.public = True
+            response.cache_control.max_age = 3600
+            return response
         
         @self.app.route('/', methods=['POST'])
         def handle_jsonrpc():
             try:
-                data = request.get_json()
+                try:
+                    data = orjson.loads(request.get_data())
+                except orjson.JSONDecodeError:
+                    return _json_response(self._create_error_response(None, -32700, "Parse error"))
                 
                 if not self._validate_jsonrpc_request(data):
-                    return jsonify(self._create_error_response(data.get('id'), -32600, "Invalid Request"))
+                    request_id = data.get('id') if isinstance(data, dict) else None
+                    return _json_response(self._create_error_response(request_id, -32600, "Invalid Request"))
                 
                 method = data['method']
                 params = data.get('params', {})
                 request_id = data['id']
                 
-                if method == 'message/send':
-                    return jsonify(self._handle_message_send(params, request_id))
-                elif method == 'tasks/get':
-                    return jsonify(self._handle_tasks_get(params, request_id))
-                elif method == 'tasks/cancel':
-                    return jsonify(self._handle_tasks_cancel(params, request_id))
-                else:
-                    return jsonify(self._create_error_response(request_id, -32601, "Method not found"))
+                handler = self._rpc_dispatch.get(method)
+                if handler is None:
+                    return _json_response(self._create_error_response(request_id, -32601, "Method not found"))
+                return _json_response(handler(params, request_id))
                     
             except Exception as e:
                 print(f"A2A-SERVICE: Error handling request: {e}")
-                return jsonify(self._create_error_response(None, -32603, "Internal error"))
+                return _json_response(self._create_error_response(None, -32603, "Internal error"))
     
     def _validate_jsonrpc_request(self, data):
-        if not isinstance(data, dict):
-            return False
-        if data.get('jsonrpc') != '2.0':
-            return False
-        if 'method' not in data:
-            return False
-        if 'id' not in data:
-            return False
-        return True
+        # One short-circuiting expression; a well-formed request pays for four cheap checks
+        return isinstance(data, dict) and data.get('jsonrpc') == '2.0' and 'method' in data and 'id' in data
     
     def _create_error_response(self, request_id, code, message, data=None):
         response = {
@@ -342,7 +613,7 @@ class A2ATriageService:
             parts = message.get('parts', [])
             task_id = message.get('taskId')
             context_id = message.get('contextId')
-            message_id = message.get('messageId', str(uuid.uuid4()))
+            message_id = message.get('messageId') or secrets.token_hex(16)
             
             user_text = ""
             for part in parts:
@@ -350,8 +621,9 @@ class A2ATriageService:
                     user_text = part.get('text', '')
                     break
             
-            if task_id and task_id in self.tasks:
-                return self._continue_existing_task(task_id, user_text, request_id, message)
+            task = self.tasks.get(task_id) if task_id else None
+            if task is not None:
+                return self._continue_existing_task(task, user_text, request_id, message)
             else:
                 return self._create_new_task(user_text, context_id, request_id, message)
                 
@@ -360,9 +632,9 @@ class A2ATriageService:
             return self._create_error_response(request_id, -32603, "Internal error")
     
     def _create_new_task(self, user_text, context_id, request_id, original_message):
-        task_id = str(uuid.uuid4())
+        task_id = secrets.token_hex(16)
         if not context_id:
-            context_id = str(uuid.uuid4())
+            context_id = secrets.token_hex(16)
         
         print(f"A2A-SERVICE: Creating new task {task_id}")
         
@@ -373,7 +645,7 @@ class A2ATriageService:
                 "state": TaskState.SUBMITTED,
                 "timestamp": datetime.now().isoformat()
             },
-            "history": [original_message],
+            "history": deque([original_message], maxlen=MAX_TASK_HISTORY),
             "artifacts": [],
             "metadata": {
                 "triage_token": None,
@@ -398,7 +670,7 @@ class A2ATriageService:
             agent_message = {
                 "role": "agent",
                 "parts": [{"kind": "text", "text": result['response']}],
-                "messageId": str(uuid.uuid4()),
+                "messageId": secrets.token_hex(16),
                 "taskId": task_id,
                 "contextId": context_id,
                 "kind": "message"
@@ -412,11 +684,11 @@ class A2ATriageService:
             task['status']['state'] = TaskState.FAILED
             print(f"A2A-SERVICE: Triage start failed for task {task_id}")
         
-        self.tasks[task_id] = task
-        return self._create_success_response(request_id, task)
+        self.tasks.set(task_id, task)
+        return self._create_success_response(request_id, _task_view(task))
     
-    def _continue_existing_task(self, task_id, user_text, request_id, message):
-        task = self.tasks[task_id]
+    def _continue_existing_task(self, task, user_text, request_id, message):
+        task_id = task['id']
         
         print(f"A2A-SERVICE: Continuing task {task_id}, current state: {task['status']['state']}")
         
@@ -432,7 +704,7 @@ class A2ATriageService:
             agent_message = {
                 "role": "agent",
                 "parts": [{"kind": "text", "text": result['response']}],
-                "messageId": str(uuid.uuid4()),
+                "messageId": secrets.token_hex(16),
                 "taskId": task_id,
                 "contextId": task['contextId'],
                 "kind": "message"
@@ -460,7 +732,7 @@ class A2ATriageService:
                 }
                 
                 artifact = {
-                    "artifactId": str(uuid.uuid4()),
+                    "artifactId": secrets.token_hex(16),
                     "name": "Medical Triage Assessment",
                     "description": "Results from medical triage evaluation",
                     "parts": [
@@ -488,29 +760,24 @@ class A2ATriageService:
         else:
             task['status']['state'] = TaskState.FAILED
         
-        return self._create_success_response(request_id, task)
+        return self._create_success_response(request_id, _task_view(task))
     
     def _extract_demographics(self, text):
         demographics = {}
+        text_lower = text.lower()
         
-        age_patterns = [
-            r'\b(\d{1,2})\s*(?:years?\s*old|yo)\b',
-            r'\bage\s*(?:is\s*)?(\d{1,2})\b',
-            r'\bi\s*am\s*(\d{1,2})\b'
-        ]
-        
-        for pattern in age_patterns:
-            match = re.search(pattern, text.lower())
+        for pattern in _AGE_PATTERNS:
+            match = pattern.search(text_lower)
             if match:
                 age = int(match.group(1))
                 if 1 <= age <= 120:
                     demographics['age'] = age
                     break
         
-        text_lower = text.lower()
-        if any(word in text_lower for word in ['male', 'man', 'boy', 'he', 'his', 'him']):
+        words = set(_WORD.findall(text_lower))
+        if words & _MALE_WORDS:
             demographics['sex'] = 'male'
-        elif any(word in text_lower for word in ['female', 'woman', 'girl', 'she', 'her']):
+        elif words & _FEMALE_WORDS:
             demographics['sex'] = 'female'
         
         return demographics
@@ -536,7 +803,7 @@ class A2ATriageService:
     
     def _send_triage_message(self, task, message):
         try:
-            token = task['metadata']['triage_token']
+            token = self._get_triage_token()
             survey_id = task['metadata']['survey_id']
             
             result = self._send_triage_api_message(token, survey_id, message)
@@ -547,15 +814,15 @@ class A2ATriageService:
     
     def _get_triage_summary(self, task):
         try:
-            token = task['metadata']['triage_token']
+            token = self._get_triage_token()
             survey_id = task['metadata']['survey_id']
             
             headers = {"Authorization": f"Bearer {token}"}
-            response = requests.get(f"{self.base_url}/surveys/{survey_id}/summary", 
-                                  headers=headers, timeout=30)
+            response = self.http.get(f"{self.base_url}/surveys/{survey_id}/summary", 
+                                     headers=headers, timeout=30)
             
             if response.status_code == 200:
-                data = response.json()
+                data = orjson.loads(response.content)
                 return {
                     'success': True,
                     'urgency_level': data.get('urgency', 'standard'),
@@ -568,7 +835,19 @@ class A2ATriageService:
             print(f"A2A-SERVICE: Summary error: {e}")
             return {'success': False}
     
+    def _token_valid(self):
+        return self._token is not None and time.monotonic() < self._token_expires - 60
+    
     def _get_triage_token(self):
+        if self._token_valid():
+            return self._token
+        
+        with self._token_lock:
+            if self._token_valid():
+                return self._token
+            return self._fetch_triage_token()
+    
+    def _fetch_triage_token(self):
         print("A2A-SERVICE: Requesting triage API token...")
         creds = base64.b64encode(f"{self.app_id}:{self.app_key}".encode()).decode()
         headers = {
@@ -578,10 +857,13 @@ class A2ATriageService:
         }
         payload = {"grant_type": "client_credentials"}
         
-        response = requests.post(self.token_url, headers=headers, json=payload, timeout=30)
+        response = self.http.post(self.token_url, headers=headers, data=orjson.dumps(payload), timeout=30)
         
         if response.status_code == 200:
-            token = response.json()['access_token']
+            data = orjson.loads(response.content)
+            token = data['access_token']
+            self._token = token
+            self._token_expires = time.monotonic() + int(data.get('expires_in', 3600))
             print(f"A2A-SERVICE: Token obtained")
             return token
         
@@ -592,10 +874,10 @@ class A2ATriageService:
         headers = {"Authorization": f"Bearer {token}", "Content-Type": "application/json"}
         payload = {"sex": sex.lower(), "age": {"value": age, "unit": "year"}}
         
-        response = requests.post(f"{self.base_url}/surveys", headers=headers, json=payload, timeout=30)
+        response = self.http.post(f"{self.base_url}/surveys", headers=headers, data=orjson.dumps(payload), timeout=30)
         
         if response.status_code == 200:
-            survey_id = response.json()['survey_id']
+            survey_id = orjson.loads(response.content)['survey_id']
             print(f"A2A-SERVICE: Survey created: {survey_id}")
             return survey_id
         
@@ -606,13 +888,13 @@ class A2ATriageService:
         headers = {"Authorization": f"Bearer {token}", "Content-Type": "application/json"}
         payload = {"user_message": message}
         
-        response = requests.post(f"{self.base_url}/surveys/{survey_id}/messages", 
-                               headers=headers, json=payload, timeout=30)
+        response = self.http.post(f"{self.base_url}/surveys/{survey_id}/messages", 
+                                  headers=headers, data=orjson.dumps(payload), timeout=30)
         
         print(f"A2A-SERVICE: <<< External API response status: {response.status_code}")
         
         if response.status_code == 200:
-            data = response.json()
+            data = orjson.loads(response.content)
             external_state = data.get('survey_state', 'in_progress')
             agent_response = data.get('assistant_message', '')
             
@@ -630,56 +912,76 @@ class A2ATriageService:
     
     def _handle_tasks_get(self, params, request_id):
         task_id = params.get('id')
-        if not task_id or task_id not in self.tasks:
+        task = self.tasks.get(task_id) if task_id else None
+        if task is None:
             return self._create_error_response(request_id, -32001, "Task not found")
         
-        task = self.tasks[task_id]
         history_length = params.get('historyLength', 10)
-        
-        if history_length and len(task.get('history', [])) > history_length:
-            task_copy = task.copy()
-            task_copy['history'] = task['history'][-history_length:]
-            return self._create_success_response(request_id, task_copy)
-        
-        return self._create_success_response(request_id, task)
+        return self._create_success_response(request_id, _task_view(task, history_length))
     
     def _handle_tasks_cancel(self, params, request_id):
         task_id = params.get('id')
-        if not task_id or task_id not in self.tasks:
+        task = self.tasks.get(task_id) if task_id else None
+        if task is None:
             return self._create_error_response(request_id, -32001, "Task not found")
         
-        task = self.tasks[task_id]
-        
         if task['status']['state'] in [TaskState.COMPLETED, TaskState.FAILED, TaskState.CANCELED]:
             return self._create_error_response(request_id, -32002, "Task cannot be canceled")
         
         task['status']['state'] = TaskState.CANCELED
         task['status']['timestamp'] = datetime.now().isoformat()
         
-        return self._create_success_response(request_id, task)
+        return self._create_success_response(request_id, _task_view(task))
+    
+    def _prefetch_triage_token(self):
+        """Fetch the shared token ahead of the first task; a failure is retried on demand"""
+        try:
+            self._get_triage_token()
+        except Exception as e:
+            print(f"A2A-SERVICE: Token prefetch failed: {e}")
     
     def run(self):
         print("A2A Triage Service starting on localhost:8887")
-        self.app.run(host='localhost', port=8887, debug=False, use_reloader=False)
+        
+        # The first message/send would otherwise wait a full token round trip
+        # before it can create its survey
+        threading.Thread(target=self._prefetch_triage_token, daemon=True).start()
+        
+        if _gevent_patched():
+            from gevent.pywsgi import WSGIServer
+            print("A2A-SERVICE: Serving with gevent WSGIServer")
+            WSGIServer(('localhost', 8887), self.app, log=None).serve_forever()
+            return
+        
+        self.app.run(host='localhost', port=8887, debug=False, use_reloader=False, threaded=True)
+
+def _gevent_patched():
+    """Check whether the socket module has been monkey-patched by gevent"""
+    try:
+        from gevent import monkey
+    except ImportError:
+        return False
+    return monkey.is_module_patched('socket')
 
 # A2A Client
 class A2AClient:
-    def __init__(self):
+    def __init__(self, http=None):
         self.base_url = "http://localhost:8887"
-        self.agent_id = f"client_{uuid.uuid4().hex[:8]}"
+        self.agent_id = f"client_{secrets.token_hex(4)}"
         self.agent_card = None
+        # One keep-alive connection pool for every call, instead of a new connection per request
+        self.http = http or create_http_session(pool_maxsize=4)
         print(f"A2A-CLIENT: Initialized as {self.agent_id}")
     
     async def discover_agent(self):
         try:
             def _request():
-                return requests.get(f"{self.base_url}/.well-known/agent-card.json", timeout=30)
+                return self.http.get(f"{self.base_url}/.well-known/agent-card.json", timeout=30)
             
-            loop = asyncio.get_event_loop()
-            response = await loop.run_in_executor(None, _request)
+            response = await run_blocking_http(_request)
             
             if response.status_code == 200:
-                self.agent_card = response.json()
+                self.agent_card = orjson.loads(response.content)
                 print(f"A2A-CLIENT: Discovered agent: {self.agent_card['name']}")
                 return True
         except Exception as e:
@@ -690,7 +992,7 @@ class A2AClient:
         message = {
             "role": "user",
             "parts": message_parts,
-            "messageId": str(uuid.uuid4()),
+            "messageId": secrets.token_hex(16),
             "kind": "message"
         }
         
@@ -699,9 +1001,9 @@ class A2AClient:
         if context_id:
             message["contextId"] = context_id
         
-        payload = {
+        payload = orjson.dumps({
             "jsonrpc": "2.0",
-            "id": str(uuid.uuid4()),
+            "id": secrets.token_hex(16),
             "method": "message/send",
             "params": {
                 "message": message,
@@ -710,18 +1012,17 @@ class A2AClient:
                     "blocking": True
                 }
             }
-        }
+        })
         
         try:
             def _request():
-                return requests.post(self.base_url, json=payload, 
-                                   headers={"Content-Type": "application/json"}, timeout=30)
+                return self.http.post(self.base_url, data=payload, 
+                                      headers={"Content-Type": "application/json"}, timeout=30)
             
-            loop = asyncio.get_event_loop()
-            response = await loop.run_in_executor(None, _request)
+            response = await run_blocking_http(_request)
             
             if response.status_code == 200:
-                data = response.json()
+                data = orjson.loads(response.content)
                 if 'result' in data:
                     return data['result']
                 elif 'error' in data:
@@ -735,39 +1036,117 @@ class A2AClient:
             print(f"A2A-CLIENT: Request failed: {e}")
             return None
 
-# LLM Client
-class LLMClient:
-    def __init__(self, jwt_token, endpoint_url, project_id, connection_id):
-        self.headers = {
-            'Content-Type': 'application/json',
-            'Authorization': f'Bearer {jwt_token}'
-        }
-        self.endpoint_url = endpoint_url
-        self.project_id = project_id
-        self.connection_id = connection_id
-        print("LLM: Initialized with JWT endpoint")
+# LLM streaming
+_RESPONSE_FIELD = re.compile(r'"response"\s*:\s*"')
+_NO_TRIAGE = re.compile(r'"need_triage"\s*:\s*false')
+_NO_DISCOVERY = re.compile(r'"call_discovery"\s*:\s*false')
+_NO_ELIGIBILITY = re.compile(r'"call_eligibility"\s*:\s*false')
+_SENTENCE_BREAK = re.compile(r'(?<=[.!?])\s+')
+_JSON_ESCAPES = {'n': '\n', 't': '\t', 'r': '\r', 'b': '\b', 'f': '\f'}
+
+def _unicode_escape(buf, i):
+    """Decode the \\uXXXX escape at buf[i], joining a UTF-16 surrogate pair.
     
-    async def process(self, user_input, session):
-        print(f"LLM: Processing: '{user_input[:50]}...'")
+    Returns (char, length), or None when more input is needed to finish it. A
+    lone surrogate becomes U+FFFD, since it cannot be printed or spoken; a
+    malformed escape raises ValueError.
+    """
+    n = len(buf)
+    if i + 6 > n:
+        return None
+    code = int(buf[i + 2:i + 6], 16)
+    if not 0xD800 <= code < 0xE000:
+        return chr(code), 6
+    if code >= 0xDC00 or (i + 6 < n and buf[i + 6] != '\\'):
+        return '\ufffd', 6
+    # High surrogate: its low half may still be on the way
+    if i + 12 > n:
+        return None
+    low = int(buf[i + 8:i + 12], 16) if buf[i + 7] == 'u' else 0
+    if not 0xDC00 <= low < 0xE000:
+        return '\ufffd', 6
+    return chr(0x10000 + ((code - 0xD800) << 10) + (low - 0xDC00)), 12
+
+class ResponseStreamer:
+    """Pulls the "response" string out of a streamed JSON completion, one sentence at a time.
+    
+    Only streams when the fields before "response" rule out triage, discovery and
+    eligibility, since the agent acts on those or speaks their results first.
+    """
+    def __init__(self):
+        self.buffer = ""
+        self.pos = None
+        self.pending = []
+        self.enabled = True
+        self.done = False
+    
+    def feed(self, delta):
+        self.buffer += delta
+        if self.done or not self.enabled:
+            return []
+        
+        if self.pos is None:
+            match = _RESPONSE_FIELD.search(self.buffer)
+            if not match:
+                return []
+            prefix = self.buffer[:match.start()]
+            if not (_NO_TRIAGE.search(prefix) and _NO_DISCOVERY.search(prefix) and _NO_ELIGIBILITY.search(prefix)):
+                self.enabled = False
+                return []
+            self.pos = match.end()
+        
+        buf, i, n = self.buffer, self.pos, len(self.buffer)
+        while i < n:
+            ch = buf[i]
+            if ch == '\\':
+                if i + 1 >= n:
+                    break
+                if buf[i + 1] == 'u':
+                    try:
+                        escape = _unicode_escape(buf, i)
+                    except ValueError:
+                        # Not valid JSON; leave the reply to the final parse
+                        self.enabled = False
+                        return []
+                    if escape is None:
+                        break
+                    self.pending.append(escape[0])
+                    i += escape[1]
+                else:
+                    self.pending.append(_JSON_ESCAPES.get(buf[i + 1], buf[i + 1]))
+                    i += 2
+                continue
+            if ch == '"':
+                self.done = True
+                break
+            self.pending.append(ch)
+            i += 1
+        self.pos = i
         
-        if session.in_triage_mode:
-            prompt = f"""You are in TRIAGE MODE. The user is answering medical assessment questions.
+        parts = _SENTENCE_BREAK.split("".join(self.pending))
+        if self.done:
+            self.pending = []
+        else:
+            self.pending = [parts.pop()]
+        return [p.strip() for p in parts if p.strip()]
 
-Current triage task: {session.triage_task_id}
-User response to triage question: "{user_input}"
+# LLM Client
+# The system prompts are module constants, identical on every call; only the
+# per-turn session state and user input are formatted, into the user message
+_TRIAGE_PROMPT = """You are in TRIAGE MODE. The user is answering medical assessment questions.
 
 Respond with:
-{{
+{
     "response": "I understand your answer. Let me continue the medical assessment.",
-    "extract": {{}},
+    "extract": {},
     "need_triage": false,
     "call_discovery": false,
     "call_eligibility": false,
     "done": false,
     "continue_triage": true
-}}"""
-        else:
-            prompt = f"""You are a healthcare appointment scheduler with this specific flow:
+}"""
+
+_SCHEDULER_PROMPT = """You are a healthcare appointment scheduler with this specific flow:
 
 1. Ask name, phone
 2. Ask reason for visit
@@ -776,11 +1155,6 @@ Respond with:
 5. Collect provider → call eligibility → announce payer, policy ID, copay
 6. Schedule appointment → confirmation code → end
 
-Current session data: {json.dumps(session.data)}
-Triage complete: {session.triage_complete}
-Triage results: {json.dumps(session.triage_results)}
-User input: "{user_input}"
-
 EXTRACTION RULES:
 - Extract name as "name"
 - Extract phone as "phone" 
@@ -790,66 +1164,227 @@ EXTRACTION RULES:
 - Extract provider name as "provider_name"
 - Extract appointment date as "preferred_date"
 
-JSON response:
-{{
-    "response": "what to say to user",
-    "extract": {{"field": "value"}},
+JSON response, with "response" as the last field:
+{
+    "extract": {"field": "value"},
     "need_triage": true/false,
     "call_discovery": true/false,
     "call_eligibility": true/false,
-    "done": true/false
-}}"""
+    "done": true/false,
+    "response": "what to say to user"
+}"""
+
+# Turn result when the LLM call fails or its answer is not a JSON object; callers only read it
+_FALLBACK_RESULT = {
+    "response": "I understand. Please continue.",
+    "extract": {},
+    "need_triage": False,
+    "call_discovery": False,
+    "call_eligibility": False,
+    "done": False
+}
+
+# Markdown fence the model sometimes wraps its JSON answer in
+_CODE_FENCE = re.compile(r'^\s*```(?:json)?|```\s*$')
+
+class LLMClient:
+    def __init__(self, jwt_token, endpoint_url, project_id, connection_id, http=None):
+        self.http = http or create_http_session()
+        self.headers = {
+            'Content-Type': 'application/json',
+            'Authorization': f'Bearer {jwt_token}'
+        }
+        self.endpoint_url = endpoint_url
+        self.project_id = project_id
+        self.connection_id = connection_id
+        print("LLM: Initialized with JWT endpoint")
+    
+    def _read_completion(self, response, streamer, push):
+        """Collect the completion text from an SSE stream, passing response sentences to push"""
+        # Endpoints without streaming support answer with a single JSON body
+        if not response.headers.get('Content-Type', '').startswith('text/event-stream'):
+            data = orjson.loads(response.content)
+            if 'choices' in data and data['choices']:
+                return data['choices'][0]['message']['content']
+            return None
+        
+        content = []
+        for line in response.iter_lines(decode_unicode=True):
+            if not line or not line.startswith('data:'):
+                continue
+            chunk = line[5:].strip()
+            if chunk == '[DONE]':
+                break
+            data = orjson.loads(chunk)
+            choices = data.get('choices')
+            delta = choices[0].get('delta', {}).get('content') if choices else None
+            if not delta:
+                continue
+            content.append(delta)
+            if push is not None:
+                for sentence in streamer.feed(delta):
+                    push(sentence)
+        return "".join(content)
+    
+    async def process(self, user_input, session, sentences=None):
+        """Ask the LLM for the next turn; if sentences (an asyncio.Queue) is given,
+        sentences of the response are put on it as they stream in, then None."""
+        print(f"LLM: Processing: '{user_input[:50]}...'")
         
-        payload = {
+        if session.in_triage_mode:
+            prompt = _TRIAGE_PROMPT
+            turn = f'Current triage task: {session.triage_task_id}\nUser response to triage question: "{user_input}"'
+        else:
+            prompt = _SCHEDULER_PROMPT
+            turn = (f'Current session data: {session.data.to_json()}\n'
+                    f'Triage complete: {session.triage_complete}\n'
+                    f'Triage results: {session.triage_results.to_json()}\n'
+                    f'User input: "{user_input}"')
+        
+        payload = orjson.dumps({
             "messages": [
                 {"role": "system", "content": prompt},
-                {"role": "user", "content": user_input}
+                {"role": "user", "content": turn}
             ],
             "project_id": self.project_id,
             "connection_id": self.connection_id,
             "max_tokens": 400,
-            "temperature": 0.2
-        }
-        
-        def _request():
-            return requests.post(self.endpoint_url, headers=self.headers, json=payload, timeout=30)
+            "temperature": 0.2,
+            "stream": True
+        })
         
-        loop = asyncio.get_event_loop()
-        response = await loop.run_in_executor(None, _request)
+        streamer = ResponseStreamer()
+        push = None
+        if sentences is not None:
+            loop = asyncio.get_running_loop()
+            # The stream is read on an HTTP executor thread; hand sentences to the loop
+            push = lambda sentence: loop.call_soon_threadsafe(sentences.put_nowait, sentence)
         
-        if response.status_code == 200:
-            data = response.json()
-            if 'choices' in data and data['choices']:
-                content = data['choices'][0]['message']['content']
-                
-                try:
-                    if content.startswith('```json'):
-                        content = content[7:]
-                    if content.endswith('```'):
-                        content = content[:-3]
-                    
-                    result = json.loads(content.strip())
-                    print("LLM: Response parsed")
-                    return result
-                except:
-                    pass
+        def _request():
+            with self.http.post(self.endpoint_url, headers=self.headers, data=payload,
+                                timeout=30, stream=True) as response:
+                if response.status_code != 200:
+                    return None
+                return self._read_completion(response, streamer, push)
         
-        return {
-            "response": "I understand. Please continue.",
-            "extract": {},
-            "need_triage": False,
-            "call_discovery": False,
-            "call_eligibility": False,
-            "done": False
-        }
+        content = None
+        try:
+            content = await run_blocking_http(_request)
+        except (requests.RequestException, orjson.JSONDecodeError, KeyError, IndexError, TypeError) as e:
+            print(f"LLM: Request failed: {e}")
+        finally:
+            if sentences is not None:
+                sentences.put_nowait(None)
+        
+        if content:
+            try:
+                result = orjson.loads(_CODE_FENCE.sub('', content).strip())
+            except orjson.JSONDecodeError:
+                result = None
+            if isinstance(result, dict):
+                print("LLM: Response parsed")
+                return result
+        
+        return _FALLBACK_RESULT
+
+# Insurance response parsing
+_DOB_US = re.compile(r'^\d{1,2}/\d{1,2}/\d{4}')
+_DOB_ISO = re.compile(r'^\d{4}-\d{1,2}-\d{1,2}')
+# Payer and member ID in one match over the original text. Each lookahead tries its label
+# anywhere before falling back to the next, so "payer" wins over an earlier "insurance"
+_DISCOVERY_FIELDS = re.compile(
+    r'(?:(?=.*?payer[:\s]*(?P<payer>[^\n,;]+))|(?=.*?insurance[:\s]*(?P<insurance>[^\n,;]+))'
+    r'|(?=.*?plan[:\s]*(?P<plan>[^\n,;]+))|)'
+    r'(?:(?=.*?member\s*id[:\s]*(?P<member_id>[a-z0-9\-]+))|(?=.*?subscriber\s*id[:\s]*(?P<subscriber_id>[a-z0-9\-]+))'
+    r'|(?=.*?policy\s*id[:\s]*(?P<policy_id>[a-z0-9\-]+))|(?=.*?policy[:\s]*(?P<policy>[a-z0-9\-]+))|)',
+    re.IGNORECASE | re.DOTALL
+)
+# Copay the same way, preferring "copay", then "copayment", then "patient responsibility"
+_COPAY_FIELDS = re.compile(
+    r'(?:(?=.*?co-?pay[:\s]*\$?(?P<copay>[0-9,]+))|(?=.*?copayment[:\s]*\$?(?P<copayment>[0-9,]+))'
+    r'|(?=.*?patient\s+responsibility[:\s]*\$?(?P<responsibility>[0-9,]+))|)',
+    re.IGNORECASE | re.DOTALL
+)
+_PROVIDER_TITLES = re.compile(r'\b(Dr\.?|MD|DO)\b', re.IGNORECASE)
+
+# The provider rarely changes within a call, and eligibility may be rechecked for it
+@lru_cache(maxsize=64)
+def _clean_provider_name(provider_name):
+    """Provider name without titles such as Dr. or MD"""
+    return _PROVIDER_TITLES.sub('', provider_name).strip()
+
+_STATE_NAMES = {
+    'al': 'Alabama', 'ak': 'Alaska', 'az': 'Arizona', 'ar': 'Arkansas', 'ca': 'California',
+    'co': 'Colorado', 'ct': 'Connecticut', 'de': 'Delaware', 'dc': 'District Of Columbia',
+    'fl': 'Florida', 'ga': 'Georgia', 'hi': 'Hawaii', 'id': 'Idaho', 'il': 'Illinois',
+    'in': 'Indiana', 'ia': 'Iowa', 'ks': 'Kansas', 'ky': 'Kentucky', 'la': 'Louisiana',
+    'me': 'Maine', 'md': 'Maryland', 'ma': 'Massachusetts', 'mi': 'Michigan', 'mn': 'Minnesota',
+    'ms': 'Mississippi', 'mo': 'Missouri', 'mt': 'Montana', 'ne': 'Nebraska', 'nv': 'Nevada',
+    'nh': 'New Hampshire', 'nj': 'New Jersey', 'nm': 'New Mexico', 'ny': 'New York',
+    'nc': 'North Carolina', 'nd': 'North Dakota', 'oh': 'Ohio', 'ok': 'Oklahoma', 'or': 'Oregon',
+    'pa': 'Pennsylvania', 'ri': 'Rhode Island', 'sc': 'South Carolina', 'sd': 'South Dakota',
+    'tn': 'Tennessee', 'tx': 'Texas', 'ut': 'Utah', 'vt': 'Vermont', 'va': 'Virginia',
+    'wa': 'Washington', 'wv': 'West Virginia', 'wi': 'Wisconsin', 'wy': 'Wyoming'
+}
+_STATES = frozenset(_STATE_NAMES.values())
+
+@lru_cache(maxsize=512)
+def _normalize_state(state_text):
+    """Return the full name for a US state name or code, or None if it is neither"""
+    if not state_text:
+        return None
+    
+    cleaned = state_text.strip().lower()
+    if cleaned in _STATE_NAMES:
+        return _STATE_NAMES[cleaned]
+    
+    name = cleaned.title()
+    return name if name in _STATES else None
+
+def _tool_result_text(result):
+    """Text of an MCP tool result's text content parts, else the whole result as a string"""
+    if isinstance(result, dict) and isinstance(result.get('content'), list):
+        text = "\n".join(part.get('text', '') for part in result['content']
+                         if isinstance(part, dict) and part.get('type') == 'text')
+        if text:
+            return text
+    return str(result)
 
 # Insurance Client
 class InsuranceClient:
-    def __init__(self, mcp_url, api_key):
+    CONNECT_TIMEOUT = 5
+    TIMEOUT = 45
+    
+    def __init__(self, mcp_url, api_key, http=None):
+        self.http = http or create_http_session()
         self.mcp_url = mcp_url
         self.headers = {"Content-Type": "application/json", "X-INF-API-KEY": api_key}
         print("INSURANCE: Client initialized")
     
+    async def _call(self, tool, arguments):
+        """Call an MCP tool; returns the HTTP response, or None if it fails or runs past TIMEOUT"""
+        # Only the id and arguments vary; the envelope is encoded with orjson in one pass
+        body = orjson.dumps({
+            "jsonrpc": "2.0",
+            "id": f"{tool}_{secrets.token_hex(8)}",
+            "method": "tools/call",
+            "params": {"name": tool, "arguments": arguments}
+        })
+        
+        def _request():
+            return self.http.post(self.mcp_url, headers=self.headers, data=body,
+                                  timeout=(self.CONNECT_TIMEOUT, self.TIMEOUT))
+        
+        # requests' read timeout applies per socket read, so a slowly trickling response
+        # could hold the turn far past TIMEOUT; wait_for bounds the whole call
+        try:
+            return await asyncio.wait_for(run_blocking_http(_request), timeout=self.TIMEOUT)
+        except asyncio.TimeoutError:
+            print(f"INSURANCE: MCP call timed out after {self.TIMEOUT}s")
+        except requests.RequestException as e:
+            print(f"INSURANCE: MCP call failed: {e}")
+        return None
+    
     def _split_name(self, name):
         parts = name.strip().split()
         if len(parts) == 1:
@@ -863,14 +1398,12 @@ class InsuranceClient:
         if not dob:
             return ""
         
-        if re.match(r'^\d{1,2}/\d{1,2}/\d{4}'
-    , dob):
+        if _DOB_US.match(dob):
             month, day, year = dob.split('/')
             formatted = f"{year}-{month.zfill(2)}-{day.zfill(2)}"
             return formatted
         
-        if re.match(r'^\d{4}-\d{1,2}-\d{1,2}'
-    , dob):
+        if _DOB_ISO.match(dob):
             return dob
         
         return dob
@@ -879,49 +1412,29 @@ class InsuranceClient:
         print(f"INSURANCE: Discovery - {name}, {dob}, {state}")
         first, last = self._split_name(name)
         formatted_dob = self._format_dob(dob)
-        formatted_state = state.strip().title() if state else ""
-        
-        payload = {
-            "jsonrpc": "2.0",
-            "id": f"discovery_{datetime.now().strftime('%Y%m%d_%H%M%S')}",
-            "method": "tools/call",
-            "params": {
-                "name": "insurance_discovery",
-                "arguments": {
-                    "patientDateOfBirth": formatted_dob,
-                    "patientFirstName": first,
-                    "patientLastName": last,
-                    "patientState": formatted_state
-                }
-            }
-        }
-        
-        def _request():
-            return requests.post(self.mcp_url, headers=self.headers, json=payload, timeout=45)
-        
-        loop = asyncio.get_event_loop()
-        response = await loop.run_in_executor(None, _request)
-        
-        if response.status_code == 200:
-            data = response.json()
+        formatted_state = _normalize_state(state)
+        if formatted_state is None:
+            # No policy can match a state that does not exist; skip the MCP round trip
+            print(f"INSURANCE: Discovery skipped - unrecognized state '{state}'")
+            return {"success": False}
+        
+        response = await self._call("insurance_discovery", {
+            "patientDateOfBirth": formatted_dob,
+            "patientFirstName": first,
+            "patientLastName": last,
+            "patientState": formatted_state
+        })
+        
+        if response is not None and response.status_code == 200:
+            data = orjson.loads(response.content)
             
             if "result" in data:
-                result_text = str(data["result"])
-                
-                payer = ""
-                member_id = ""
+                result_text = _tool_result_text(data["result"])
                 
-                for pattern in [r'payer[:\s]*([^\n,;]+)', r'insurance[:\s]*([^\n,;]+)', r'plan[:\s]*([^\n,;]+)']:
-                    match = re.search(pattern, result_text.lower())
-                    if match:
-                        payer = match.group(1).strip().title()
-                        break
-                
-                for pattern in [r'member\s*id[:\s]*([a-za-z0-9\-]+)', r'subscriber\s*id[:\s]*([a-za-z0-9\-]+)', r'policy\s*id[:\s]*([a-za-z0-9\-]+)', r'policy[:\s]*([a-za-z0-9\-]+)']:
-                    match = re.search(pattern, result_text.lower())
-                    if match:
-                        member_id = match.group(1).strip().upper()
-                        break
+                fields = _DISCOVERY_FIELDS.match(result_text)
+                payer = (fields['payer'] or fields['insurance'] or fields['plan'] or "").strip().title()
+                member_id = (fields['member_id'] or fields['subscriber_id'] or fields['policy_id']
+                             or fields['policy'] or "").strip().upper()
                 
                 return {"success": True, "payer": payer, "member_id": member_id}
         
@@ -932,91 +1445,86 @@ class InsuranceClient:
         first, last = self._split_name(name)
         formatted_dob = self._format_dob(dob)
         
-        provider_clean = re.sub(r'\b(Dr\.?|MD|DO)\b', '', provider_name, flags=re.IGNORECASE).strip()
+        provider_clean = _clean_provider_name(provider_name)
         provider_first, provider_last = self._split_name(provider_clean)
         
-        payload = {
-            "jsonrpc": "2.0",
-            "id": f"eligibility_{datetime.now().strftime('%Y%m%d_%H%M%S')}",
-            "method": "tools/call",
-            "params": {
-                "name": "benefits_eligibility",
-                "arguments": {
-                    "patientFirstName": first,
-                    "patientLastName": last,
-                    "patientDateOfBirth": formatted_dob,
-                    "subscriberId": subscriber_id,
-                    "payerName": payer_name,
-                    "providerFirstName": provider_first,
-                    "providerLastName": provider_last,
-                    "providerNpi": "1234567890"
-                }
-            }
-        }
-        
-        def _request():
-            return requests.post(self.mcp_url, headers=self.headers, json=payload, timeout=45)
-        
-        loop = asyncio.get_event_loop()
-        response = await loop.run_in_executor(None, _request)
-        
-        if response.status_code == 200:
-            data = response.json()
+        response = await self._call("benefits_eligibility", {
+            "patientFirstName": first,
+            "patientLastName": last,
+            "patientDateOfBirth": formatted_dob,
+            "subscriberId": subscriber_id,
+            "payerName": payer_name,
+            "providerFirstName": provider_first,
+            "providerLastName": provider_last,
+            "providerNpi": "1234567890"
+        })
+        
+        if response is not None and response.status_code == 200:
+            data = orjson.loads(response.content)
             
             if "result" in data:
-                result_text = str(data["result"])
+                result_text = _tool_result_text(data["result"])
                 
-                copay = ""
-                copay_patterns = [r'co-?pay[:\s]*\$?([0-9,]+)', r'copayment[:\s]*\$?([0-9,]+)', r'patient\s+responsibility[:\s]*\$?([0-9,]+)']
-                
-                for pattern in copay_patterns:
-                    copay_match = re.search(pattern, result_text.lower())
-                    if copay_match:
-                        copay = copay_match.group(1)
-                        break
+                fields = _COPAY_FIELDS.match(result_text)
+                copay = fields['copay'] or fields['copayment'] or fields['responsibility'] or ""
                 
                 return {"success": True, "copay": copay}
         
         return {"success": False}
 
+# Session fields each insurance call needs
+_DISCOVERY_REQUIRED = ('name', 'date_of_birth', 'state')
+_ELIGIBILITY_REQUIRED = ('name', 'date_of_birth', 'member_id', 'payer', 'provider_name')
+
+# Confirmation codes read out to the caller
+_CONFIRMATION_ALPHABET = string.ascii_uppercase + string.digits
+
+# Whole words only: "end" must not match "weekend" or "attend"
+_GOODBYE = re.compile(r'\b(?:bye|goodbye|end|quit)\b', re.IGNORECASE)
+
+# Agent settings, in the order LLMClient and InsuranceClient take them
+_JWT_CONFIG = ('JWT_TOKEN', 'ENDPOINT_URL', 'PROJECT_ID', 'CONNECTION_ID')
+_INSURANCE_CONFIG = ('MCP_URL', 'X_INF_API_KEY')
+
+def load_agent_config():
+    """Read the agent's settings from the environment once"""
+    return {var: os.getenv(var) for var in _JWT_CONFIG + _INSURANCE_CONFIG}
+
 # FIXED Healthcare Agent
 class HealthcareAgent:
-    def __init__(self):
+    def __init__(self, config=None):
+        config = config or load_agent_config()
         self.session = Session()
         self.audio = AudioSystem()
         
-        jwt_token = os.getenv('JWT_TOKEN')
-        endpoint_url = os.getenv('ENDPOINT_URL')
-        project_id = os.getenv('PROJECT_ID')
-        connection_id = os.getenv('CONNECTION_ID')
-        
-        if not all([jwt_token, endpoint_url, project_id, connection_id]):
+        if not all(config[var] for var in _JWT_CONFIG):
             raise Exception("Missing JWT config")
             
-        self.llm = LLMClient(jwt_token, endpoint_url, project_id, connection_id)
+        # One keep-alive pool for the LLM, MCP and A2A calls of the whole conversation
+        self.http = create_http_session()
+        self.llm = LLMClient(*(config[var] for var in _JWT_CONFIG), http=self.http)
         
-        mcp_url = os.getenv('MCP_URL')
-        insurance_key = os.getenv('X_INF_API_KEY')
-        if not mcp_url or not insurance_key:
+        if not all(config[var] for var in _INSURANCE_CONFIG):
             raise Exception("Missing insurance config")
             
-        self.insurance = InsuranceClient(mcp_url, insurance_key)
+        self.insurance = InsuranceClient(*(config[var] for var in _INSURANCE_CONFIG), http=self.http)
         
         self.a2a_client = None
         
         try:
-            self.a2a_client = A2AClient()
+            self.a2a_client = A2AClient(http=self.http)
         except:
             print("A2A client not available")
     
     async def start(self):
         print(f"Healthcare Agent starting - Session {self.session.id}")
         
-        if self.a2a_client:
-            await self.a2a_client.discover_agent()
-        
         initial_message = "Hello! I'm your healthcare appointment assistant. Let's start by getting your basic information. What's your full name?"
-        await self.audio.speak(initial_message)
+        # Triage service discovery only has to finish before triage starts; do it while the greeting plays
+        if self.a2a_client:
+            await asyncio.gather(self.audio.speak(initial_message), self.a2a_client.discover_agent())
+        else:
+            await self.audio.speak(initial_message)
         self.session.add_interaction("assistant", initial_message)
         
         turn = 0
@@ -1043,7 +1551,7 @@ class HealthcareAgent:
             print(f"USER: {user_input}")
             self.session.add_interaction("user", user_input)
             
-            if any(phrase in user_input.lower() for phrase in ['bye', 'goodbye', 'end', 'quit']):
+            if _GOODBYE.search(user_input):
                 await self.audio.speak("Thank you for calling. Have a great day!")
                 self.session.add_interaction("assistant", "Thank you for calling. Have a great day!")
                 break
@@ -1051,7 +1559,11 @@ class HealthcareAgent:
             if self.session.in_triage_mode:
                 await self._handle_triage_conversation(user_input)
             else:
-                result = await self.llm.process(user_input, self.session)
+                # Speak the response while it is still being generated
+                sentences = asyncio.Queue()
+                speaker = asyncio.create_task(self.audio.speak_stream(sentences))
+                result = await self.llm.process(user_input, self.session, sentences)
+                streamed = await speaker
                 
                 if result.get("extract"):
                     for key, value in result["extract"].items():
@@ -1066,38 +1578,38 @@ class HealthcareAgent:
                     await self._start_integrated_triage()
                     continue
                 
-                if result.get("call_discovery"):
-                    required = ['name', 'date_of_birth', 'state']
-                    if all(k in self.session.data and self.session.data[k] for k in required):
-                        print("INSURANCE-DISCOVERY: Calling API...")
-                        discovery = await self.insurance.discovery(
-                            self.session.data['name'],
-                            self.session.data['date_of_birth'],
-                            self.session.data['state']
-                        )
-                        if discovery["success"]:
-                            self.session.data['payer'] = discovery['payer']
-                            self.session.data['member_id'] = discovery['member_id']
-                            
-                            insurance_message = f"Great! I found your insurance: {discovery['payer']}, Policy ID: {discovery['member_id']}."
-                            await self.audio.speak(insurance_message)
-                            self.session.add_interaction("assistant", insurance_message)
-                        else:
-                            fallback_msg = "I had some trouble finding your insurance, but we can proceed."
-                            await self.audio.speak(fallback_msg)
-                            self.session.add_interaction("assistant", fallback_msg)
+                eligibility = None
+                if result.get("call_discovery") and not self.session.data.missing(_DISCOVERY_REQUIRED):
+                    print("INSURANCE-DISCOVERY: Calling API...")
+                    discovery_call = self.insurance.discovery(
+                        self.session.data['name'],
+                        self.session.data['date_of_birth'],
+                        self.session.data['state']
+                    )
+                    if result.get("call_eligibility") and not self.session.data.missing(_ELIGIBILITY_REQUIRED):
+                        # A payer and member ID are already on file, so the two MCP calls are independent
+                        discovery, eligibility = await asyncio.gather(discovery_call, self._check_eligibility())
+                    else:
+                        discovery = await discovery_call
+                    
+                    if discovery["success"]:
+                        if (discovery['payer'], discovery['member_id']) != (self.session.data.get('payer'), self.session.data.get('member_id')):
+                            eligibility = None  # checked against the old policy; redo it below
+                        self.session.data['payer'] = discovery['payer']
+                        self.session.data['member_id'] = discovery['member_id']
+                        
+                        insurance_message = f"Great! I found your insurance: {discovery['payer']}, Policy ID: {discovery['member_id']}."
+                        await self.audio.speak(insurance_message)
+                        self.session.add_interaction("assistant", insurance_message)
+                    else:
+                        fallback_msg = "I had some trouble finding your insurance, but we can proceed."
+                        await self.audio.speak(fallback_msg)
+                        self.session.add_interaction("assistant", fallback_msg)
                 
                 if result.get("call_eligibility"):
-                    required = ['name', 'date_of_birth', 'member_id', 'payer', 'provider_name']
-                    if all(k in self.session.data and self.session.data[k] for k in required):
-                        print("INSURANCE-ELIGIBILITY: Calling API...")
-                        eligibility = await self.insurance.eligibility(
-                            self.session.data['name'],
-                            self.session.data['date_of_birth'],
-                            self.session.data['member_id'],
-                            self.session.data['payer'],
-                            self.session.data['provider_name']
-                        )
+                    if eligibility is None and not self.session.data.missing(_ELIGIBILITY_REQUIRED):
+                        eligibility = await self._check_eligibility()
+                    if eligibility is not None:
                         if eligibility["success"] and eligibility.get('copay'):
                             eligibility_message = f"Perfect! Your insurance is verified. Payer: {self.session.data['payer']}, Policy ID: {self.session.data['member_id']}, Your copay will be ${eligibility['copay']}."
                             await self.audio.speak(eligibility_message)
@@ -1109,11 +1621,12 @@ class HealthcareAgent:
                 
                 response = result.get("response", "")
                 if response:
-                    await self.audio.speak(response)
+                    if not streamed:
+                        await self.audio.speak(response)
                     self.session.add_interaction("assistant", response)
                 
                 if result.get("done"):
-                    confirmation = ''.join(random.choices(string.ascii_uppercase + string.digits, k=6))
+                    confirmation = ''.join(secrets.choice(_CONFIRMATION_ALPHABET) for _ in range(6))
                     final_message = f"Excellent! Your appointment is confirmed. Confirmation number: {confirmation}. You'll receive an email confirmation shortly. Thank you for calling!"
                     await self.audio.speak(final_message)
                     self.session.add_interaction("assistant", final_message)
@@ -1121,10 +1634,21 @@ class HealthcareAgent:
         
         print(f"Conversation ended. Final data: {self.session.data}")
         
-        saved_file = self.session.save_to_file()
+        # Serializing and fsyncing is blocking file I/O; keep it off the event loop
+        saved_file = await asyncio.to_thread(self.session.save_to_file)
         if saved_file:
             print(f"Session saved to: {saved_file}")
     
+    async def _check_eligibility(self):
+        print("INSURANCE-ELIGIBILITY: Calling API...")
+        return await self.insurance.eligibility(
+            self.session.data['name'],
+            self.session.data['date_of_birth'],
+            self.session.data['member_id'],
+            self.session.data['payer'],
+            self.session.data['provider_name']
+        )
+    
     async def _start_integrated_triage(self):
         self.session.triage_attempts += 1
         self.session.in_triage_mode = True
@@ -1278,12 +1802,8 @@ def run_agent():
     print("HEALTHCARE VOICE + A2A + MCP AGENT")
     print("=" * 50)
     
-    jwt_required = ['JWT_TOKEN', 'ENDPOINT_URL', 'PROJECT_ID', 'CONNECTION_ID']
-    insurance_required = ['MCP_URL', 'X_INF_API_KEY']
-    
-    missing = []
-    missing.extend([var for var in jwt_required if not os.getenv(var)])
-    missing.extend([var for var in insurance_required if not os.getenv(var)])
+    config = load_agent_config()
+    missing = [var for var, value in config.items() if not value]
     
     if missing:
         print(f"ERROR: Missing config: {missing}")
@@ -1297,7 +1817,7 @@ def run_agent():
     
     async def start():
         try:
-            agent = HealthcareAgent()
+            agent = HealthcareAgent(config)
             await agent.start()
         except KeyboardInterrupt:
             print("\nAgent stopped by user")
@@ -1305,13 +1825,17 @@ def run_agent():
             print(f"Agent error: {e}")
     
     try:
-        asyncio.run(start())
+        # uvloop's libuv event loop has less per-callback overhead than asyncio's; optional
+        try:
+            import uvloop
+        except ImportError:
+            asyncio.run(start())
+        else:
+            uvloop.run(start())
     except KeyboardInterrupt:
         print("\nShutting down...")
 
 def main():
-    import sys
-    
     if len(sys.argv) > 1 and sys.argv[1] == "service":
         run_service()
     else: